@@ -15,6 +15,11 @@ class WorkspacePrunner:
     a workspace fulled with information,
     performs the selection of information within
     the workspace, using ConceptNetwork's activation.
+
+    To keep the ConceptNetwork unchanged (and use it for
+    other workspaces), give an activation session instead :
+    WorkspacePrunner(workspace, cn.session()).
+    @see concepts_network.session
     """
 
     def __init__(self, workspace, concept_network):
@@ -55,9 +60,7 @@ class WorkspacePrunner:
         operation (the ConceptNetwork contains more information
         than pure activation).
         """
-        to_keep = [
-            i for i in self.cnetwork.get_activated_nodes(offset=prune_level + 1)
-        ]
+        to_keep = self.cnetwork.activated_above(offset=prune_level + 1)
         items = [i for i in self.wks.items()]
         for n, d in items:
             if d['norm'] not in to_keep:
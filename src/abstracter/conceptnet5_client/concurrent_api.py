@@ -12,15 +12,35 @@ Search finds a list of edges that match certain criteria.
 Association is for finding concepts similar
 to a particular concept or a list of concepts.
 
+If settings.LOCAL_STORE is set, queries are answered by a
+local copy of ConceptNet5 instead (see local_store.py).
+
 @see api For simple, non-concurrent queries.
 @see result.py For parsing queries result.
 """
 
+import threading
 import urllib.parse
 import abstracter.util.concurrent as co
 from abstracter.conceptnet5_client.result import parse_relevant_edges, parse_similar_concepts
 import abstracter.conceptnet5_client.settings as settings
 
+# LocalStore of each thread.
+_LOCAL = threading.local()
+
+
+def get_local_store():
+    """
+    @return The local_store.LocalStore given by settings.LOCAL_STORE
+    (opened once in each thread), or None.
+    """
+    if not settings.LOCAL_STORE:
+        return None
+    if getattr(_LOCAL, 'store', None) is None:
+        from abstracter.conceptnet5_client.local_store import LocalStore
+        _LOCAL.store = LocalStore(settings.LOCAL_STORE)
+    return _LOCAL.store
+
 
 def lookup_url(concept, filter='/c/en/', limit=10, **kwargs):
     """
@@ -53,6 +73,9 @@ def search_concepts(concepts, filter='/c/en/', limit=10, **kwargs):
     @param kwargs Other supported lookup arguments, for each query.
     @return A dict which contains, for each concept, a list of result.Edge objects.
     '''
+    store = get_local_store()
+    if store is not None:
+        return store.search_concepts(concepts, filter, limit, **kwargs)
     urls = {}
     for concept in concepts:
         urls[concept] = lookup_url(concept, filter, limit, **kwargs)
@@ -91,6 +114,9 @@ def get_similar_concepts(concepts, filter='/c/en/', limit=10, **kwargs):
     @param kwargs Other supported association arguments.
     @return A dict which contains, for each concept, a list of [concept,similarity].
     """
+    store = get_local_store()
+    if store is not None:
+        return store.get_similar_concepts(concepts, filter, limit, **kwargs)
     urls = {}
     # we build a dict of url
     for concept in concepts:
@@ -128,6 +154,9 @@ def search_edges_from(concepts, filter='/c/en/', limit=10, **kwargs):
     @param kwargs Other supported search arguments.
     @return A dict which contains, for each concept, a list of result.Edge objects.
     """
+    store = get_local_store()
+    if store is not None:
+        return store.search_edges_from(concepts, filter, limit, **kwargs)
     # build urls dict
     urls = {}
     for concept in concepts:
@@ -0,0 +1,243 @@
+"""@file local_store.py
+@brief Local copy of ConceptNet5, built from a dump.
+
+The web API of ConceptNet5 is slow and rate limited. A LocalStore
+answers the same queries as concurrent_api (search_concepts,
+search_edges_from, get_similar_concepts) from a SQLite file, built
+once from an assertions dump :
+* a CSV dump (one assertion per line, tab-separated : uri, rel, start,
+end, then either the weight in the sixth column (5.3) or a JSON dict
+of information containing the weight (5.4 and later)),
+* or a JSON stream dump (one edge dict per line, with start, rel, end, weight).
+Dumps may be gzipped (.gz).
+
+Only edges between concepts of settings.LANGUAGE, with a relation
+in data_settings.USEFUL_CONCEPTNET_EDGES and relevant concepts
+(result.is_relevant_concept), are imported. Edges are indexed by start
+and by end concept.
+
+Example :
+@code
+from abstracter.conceptnet5_client.local_store import import_dump, LocalStore
+
+import_dump("conceptnet-assertions-5.3.csv.gz", "conceptnet.sqlite")  # once
+
+store = LocalStore("conceptnet.sqlite")
+for e in store.search_edges_from(["dog"], minWeight=1.3)["dog"]:
+    e.print_edge()
+@endcode
+
+To use it in place of the web API (for example in cn_generation),
+set settings.LOCAL_STORE to the name of the file.
+
+@see concurrent_api.py
+"""
+
+import gzip
+import json
+import math
+import sqlite3
+import sys
+import abstracter.conceptnet5_client.settings as settings
+from abstracter.conceptnet5_client.result import Edge, relevant_words
+
+###########################
+# Number of edges inserted at once during an import.
+############################
+
+IMPORT_BATCH_SIZE = 50000
+
+###########################
+# Similarity : number of (heaviest) neighbours whose own
+# neighbours are candidates, and number of candidates
+# (sharing most neighbours) which are compared.
+############################
+
+SIMILARITY_NEIGHBOURS = 50
+
+SIMILARITY_CANDIDATES = 200
+
+
+def _open(filename):
+    if filename.endswith('.gz'):
+        return gzip.open(filename, 'rt', encoding='utf-8')
+    return open(filename, 'r', encoding='utf-8')
+
+
+def read_dump(filename):
+    """
+    Reads the assertions of a dump.
+
+    @return Generator of [rel uri, start uri, end uri, weight].
+    """
+    with _open(filename) as file:
+        for line in file:
+            if line.startswith('{'):
+                edge = json.loads(line)
+                yield [edge['rel'], edge['start'], edge['end'], float(edge.get('weight', 1))]
+                continue
+            fields = line.rstrip('\n').split('\t')
+            if len(fields) < 5:
+                continue
+            if len(fields) == 5:
+                weight = json.loads(fields[4]).get('weight', 1)
+            else:
+                weight = fields[5]
+            yield [fields[1], fields[2], fields[3], float(weight)]
+
+
+def relevant_edges(assertions, clean_self_ref=True):
+    """
+    Filters assertions, like result.parse_relevant_edges (result.relevant_words).
+
+    @param assertions Iterable of [rel uri, start uri, end uri, weight].
+    @return Generator of [rel, start, end, weight], with words instead of uris.
+    """
+    prefix = '/c/' + settings.LANGUAGE + '/'
+    for rel, start, end, weight in assertions:
+        if start.startswith(prefix) and end.startswith(prefix):
+            words = relevant_words(rel, start, end, clean_self_ref)
+            if words is not None:
+                yield words + [weight]
+
+
+def import_dump(dump, filename, verbose=True):
+    """
+    @brief Builds a LocalStore file from a dump.
+
+    @param dump Name of the dump file (.csv, .jsons, maybe .gz).
+    @param filename Name of the SQLite file to create (its edges are replaced).
+    @return The number of imported edges.
+    """
+    connection = sqlite3.connect(filename)
+    connection.execute("DROP TABLE IF EXISTS edges")
+    connection.execute("CREATE TABLE edges (start TEXT, rel TEXT, end TEXT, weight REAL)")
+    batch = []
+    count = 0
+    for edge in relevant_edges(read_dump(dump)):
+        batch.append(edge[1:2] + edge[0:1] + edge[2:])
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            connection.executemany("INSERT INTO edges VALUES (?, ?, ?, ?)", batch)
+            count += len(batch)
+            batch = []
+            if verbose:
+                print(count.__str__() + " edges imported !")
+    connection.executemany("INSERT INTO edges VALUES (?, ?, ?, ?)", batch)
+    count += len(batch)
+    if verbose:
+        print("Indexing " + count.__str__() + " edges...")
+    connection.execute("CREATE INDEX edges_start ON edges (start, weight)")
+    connection.execute("CREATE INDEX edges_end ON edges (end, weight)")
+    connection.commit()
+    connection.close()
+    return count
+
+
+class LocalStore:
+    """
+    @class LocalStore
+    @brief ConceptNet5 queries, answered from a file built by import_dump.
+
+    Results are the ones of concurrent_api, once parsed : result.Edge objects
+    with words as start and end, and relations without '/r/'.
+    Edges are sorted by decreasing weight.
+    """
+
+    def __init__(self, filename):
+        self.connection = sqlite3.connect(filename)
+
+    def close(self):
+        self.connection.close()
+
+    def _edges(self, query, args):
+        return [Edge.make(row[0], row[1], row[2], row[3])
+                for row in self.connection.execute(query, args)]
+
+    def edges_from(self, concept, limit=10, min_weight=None):
+        """
+        @return List of result.Edge starting at concept.
+        """
+        return self._edges("SELECT start, rel, end, weight FROM edges WHERE start = ? "
+                           "AND weight >= ? ORDER BY weight DESC LIMIT ?",
+                           (concept, -math.inf if min_weight is None else min_weight, limit))
+
+    def edges_of(self, concept, limit=10):
+        """
+        @return List of result.Edge starting or ending at concept.
+        """
+        return self._edges("SELECT start, rel, end, weight FROM edges WHERE start = ? "
+                           "UNION ALL SELECT start, rel, end, weight FROM edges WHERE end = ? "
+                           "ORDER BY 4 DESC LIMIT ?", (concept, concept, limit))
+
+    def search_concepts(self, concepts, filter='/c/en/', limit=10, **kwargs):
+        """
+        Same as concurrent_api.search_concepts (lookup).
+        """
+        return dict((concept, self.edges_of(concept.replace(' ', '_'), limit))
+                    for concept in concepts)
+
+    def search_edges_from(self, concepts, filter='/c/en/', limit=10, **kwargs):
+        """
+        Same as concurrent_api.search_edges_from.
+        Only the minWeight argument is taken into account.
+        """
+        result = dict()
+        for concept in concepts:
+            concept = concept.replace(' ', '_')
+            result[concept] = self.edges_from(concept, limit, kwargs.get('minWeight'))
+        return result
+
+    def neighbours(self, concept):
+        """
+        @return A dict neighbour : sum of the weights of the edges
+        between concept and the neighbour.
+        """
+        weights = dict()
+        for row in self.connection.execute(
+                "SELECT end, weight FROM edges WHERE start = ? "
+                "UNION ALL SELECT start, weight FROM edges WHERE end = ?", (concept, concept)):
+            weights[row[0]] = weights.get(row[0], 0) + row[1]
+        return weights
+
+    def similar_concepts(self, concept, limit=10):
+        """
+        @brief Concepts similar to a concept.
+
+        The dump does not contain the association vectors of the web API :
+        the similarity of two concepts is the cosine of their vectors of
+        neighbours' weights. Candidates are the neighbours of the heaviest
+        neighbours, sharing most of them.
+
+        @return A list of [concept, similarity], most similar first.
+        """
+        vector = self.neighbours(concept)
+        if not vector:
+            return []
+        norm = math.sqrt(sum(w * w for w in vector.values()))
+        shared = dict()
+        for n in sorted(vector, key=lambda n: (-vector[n], n))[:SIMILARITY_NEIGHBOURS]:
+            for c in self.neighbours(n):
+                shared[c] = shared.get(c, 0) + 1
+        shared.pop(concept, None)
+        candidates = sorted(shared, key=lambda c: (-shared[c], c))[:SIMILARITY_CANDIDATES]
+        similar = []
+        for c in candidates:
+            other = self.neighbours(c)
+            dot = sum(w * other[n] for n, w in vector.items() if n in other)
+            if dot > 0:
+                cosine = dot / (norm * math.sqrt(sum(w * w for w in other.values())))
+                similar.append([c, int(cosine * 1000) / 1000])
+        similar.sort(key=lambda x: (-x[1], x[0]))
+        return similar[:limit]
+
+    def get_similar_concepts(self, concepts, filter='/c/en/', limit=10, **kwargs):
+        """
+        Same as concurrent_api.get_similar_concepts.
+        @see similar_concepts
+        """
+        return dict((concept, self.similar_concepts(concept.replace(' ', '_'), limit))
+                    for concept in concepts)
+
+
+if __name__ == "__main__":
+    import_dump(sys.argv[1], sys.argv[2])
@@ -3,7 +3,6 @@ Methods for parsing a query result.
 
 @see data_settings.py Settings used.
 """
-import ast
 import abstracter.conceptnet5_client.data_settings as data_settings
 
 
@@ -38,7 +37,29 @@ def is_relevant_concept(word):
     in Conceptnet5 are more like complete sentences and they
     are not likely to be found again in a text).
     """
-    return len(word.split('_')) < data_settings.MAX_UNDERSCORES_ALLOWED + 2
+    return word.count('_') < data_settings.MAX_UNDERSCORES_ALLOWED + 1
+
+
+def relevant_words(rel, start, end, clean_self_ref=True):
+    """
+    The filter of relevant edges : the relation is useful, and both
+    concepts are relevant.
+
+    @param rel, start, end Uris of the relation and of the concepts.
+    @param clean_self_ref Indicates if edges that have the same
+    start and end have to be dismissed.
+    @return [rel, start, end] as words, or None if the edge is not relevant.
+    @see data_settings.USEFUL_CONCEPTNET_EDGES
+    """
+    if rel not in data_settings.USEFUL_CONCEPTNET_EDGES:
+        return None
+    # and e.weight*USEFUL_CONCEPTNET_EDGES[e.rel] > MINIMUM_WEIGHT_ALLOWED: unuseful
+    start = concept_to_word(start)
+    end = concept_to_word(end)
+    if (is_relevant_concept(start) and is_relevant_concept(end)
+       and not (clean_self_ref and start == end)):
+        return [rel_to_word(rel), start, end]
+    return None
 
 
 def parse_similar_concepts(json_data):
@@ -59,26 +80,20 @@ def parse_relevant_edges(json_data, clean_self_ref=True):
     @see data_settings.RELEVANT_EDGES_ATTRIBUTES
     @see data_settings.USEFUL_CONCEPTNET_EDGES
 
+    Edges are filtered (relevant_words) before anything else is
+    read, and Edge objects are only created for the kept edges.
+
     @param json_data Query result encoded in JSON.
     @param clean_self_ref Indicates if edges that have the same
     start and end have to be dismissed.
     """
-    edges = []
     if 'edges' not in json_data:
-        return edges
-    for edge_str in json_data['edges']:
-        e = Edge(edge_str)
-        if e.rel in data_settings.USEFUL_CONCEPTNET_EDGES:
-            # and e.weight*USEFUL_CONCEPTNET_EDGES[e.rel] > MINIMUM_WEIGHT_ALLOWED: unuseful
-            e.rel = rel_to_word(e.rel)
-            e.start = concept_to_word(e.start)
-            e.end = concept_to_word(e.end)
-            if is_relevant_concept(e.start) and is_relevant_concept(e.end):
-                if clean_self_ref:
-                    if e.start != e.end:
-                        edges.append(e)
-                else:
-                    edges.append(e)
+        return []
+    edges = []
+    for edge in json_data['edges']:
+        words = relevant_words(edge['rel'], edge['start'], edge['end'], clean_self_ref)
+        if words is not None:
+            edges.append(Edge.make(words[1], words[0], words[2], edge['weight']))
     return edges
 
 
@@ -87,12 +102,30 @@ class Edge(object):
     @class Edge
     This class implements the methods for representing an edge
     in Conceptnet5 and manipulating it.
+
+    Only the attributes of data_settings.RELEVANT_EDGES_ATTRIBUTES
+    are stored (in slots : edges are numerous).
     '''
+    __slots__ = data_settings.RELEVANT_EDGES_ATTRIBUTES
+
+    def __init__(self, edge_dict):
+        '''
+        @param edge_dict An edge, as decoded from a JSON result.
+        '''
+        for attribute in self.__slots__:
+            setattr(self, attribute, edge_dict[attribute])
 
-    def __init__(self, edge_str):
-        edge_dict = ast.literal_eval(str(edge_str))
-        for attribute in data_settings.RELEVANT_EDGES_ATTRIBUTES:
-            self.__dict__[attribute] = (edge_dict[attribute])
+    @classmethod
+    def make(cls, start, rel, end, weight):
+        '''
+        @return An Edge with these attributes.
+        '''
+        edge = cls.__new__(cls)
+        edge.start = start
+        edge.rel = rel
+        edge.end = end
+        edge.weight = weight
+        return edge
 
     def print_assertion(self):
         '''
@@ -112,5 +145,4 @@ class Edge(object):
         Prints all attributes regarding to this edge.
         @warning unused
         '''
-        attrs = vars(self)
-        print('\n'.join('%s: %s' % item for item in attrs.items()))
+        print('\n'.join('%s: %s' % (a, getattr(self, a)) for a in self.__slots__))
@@ -70,3 +70,12 @@ SUPPORTED_SEARCH_ARGS = ['id', 'uri', 'rel', 'start',
                          'relLemmas', 'text',
                          'surfaceText', 'minWeight', 'limit',
                          'offset', 'features', 'filter']
+
+
+#######################################
+# Local copy of ConceptNet5 (see local_store.py) : if not None,
+# name of the file built by local_store.import_dump, which
+# answers the queries of concurrent_api instead of the web API.
+##################################################
+
+LOCAL_STORE = None
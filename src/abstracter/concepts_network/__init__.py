@@ -46,11 +46,47 @@ for i in range(4):
 cn.print_activated_nodes(9)
 @endcode
 
+For big networks, propagation may be vectorized :
+@code
+prop = cn.sparse_propagator()
+prop.activate(["wayne_rooney", "steven_gerrard"])
+prop.propagate(4)
+prop.print_activated_nodes(9)
+@endcode
+@see propagation.py
+
+To share one loaded network between several activations (for
+example in several threads), use sessions :
+@code
+session = cn.session()
+session.activate(["wayne_rooney", "steven_gerrard"])
+session.propagate()
+@endcode
+@see session.py
+
 """
 
-from abstracter.util.json_stream import read_json_stream, JSONStreamWriter
+from abstracter.util.json_stream import read_json_stream, read_json_batches, JSONStreamWriter
 from abstracter.util.network import Network
+from abstracter.util.compact_network import CompactNetwork
 from math import log
+import heapq
+import gc
+import os
+import sys
+import time
+
+
+def node_id(word):
+    """
+    Transforms a word into a node id : lower case, with
+    underscores instead of white spaces.
+
+    @warning For now, in case we send bad refactored words,
+    we replace tokens like _+_ with _ which represents
+    a white space in the conceptnetwork's nodes.
+    """
+    return word.lower().replace(' ', '_').replace('_+_', '_')
 
 
 def divlog(nb):
@@ -62,6 +98,94 @@ def divlog(nb):
     return log(13 + nb) / log(13)
 
 
+def run_until(propagate, count_active, max_steps=20, tol=0, norm='linf', frontier=True):
+    """
+    @brief Propagation steps until activation is stable.
+
+    @param propagate A function doing one step of propagation and
+    returning [L1 change, Linf change] of activation.
+    @param count_active A function returning the number of activated nodes.
+    @param max_steps Maximum number of steps.
+    @param tol We stop as soon as the change is lower or equal to tol.
+    @param norm 'l1' (sum of the changes) or 'linf' (greatest change).
+    @param frontier If True, we also stop when the number of activated
+    nodes stops growing.
+    @return A dict : 'steps' taken, 'converged' (True if we stopped before
+    max_steps), and for each step 'l1', 'linf' and number of 'active' nodes.
+    """
+    report = {'steps': 0, 'converged': False, 'l1': [], 'linf': [], 'active': []}
+    active = count_active()
+    for step in range(max_steps):
+        l1, linf = propagate()
+        previous, active = active, count_active()
+        report['steps'] += 1
+        report['l1'].append(l1)
+        report['linf'].append(linf)
+        report['active'].append(active)
+        if (l1 if norm == 'l1' else linf) <= tol or (frontier and active <= previous):
+            report['converged'] = True
+            break
+    return report
+
+
+class NodeData(dict):
+    """
+    @class NodeData
+    @brief Attributes of a node of a ConceptNetwork.
+
+    It is a simple dict, which tells its ConceptNetwork
+    each time the activation 'a' is written (or removed), so that
+    the set of activated nodes is always up to date,
+    even with direct writes like cn["wayne_rooney"]['a'] = 100.
+    """
+    __slots__ = ['cn', 'id']
+
+    def __init__(self, cn, id, data=()):
+        super(NodeData, self).__init__(data)
+        self.cn = cn
+        self.id = id
+
+    def __setitem__(self, key, value):
+        super(NodeData, self).__setitem__(key, value)
+        if key == 'a':
+            self.cn.set_active(self.id, value)
+
+    def update(self, *args, **kwargs):
+        super(NodeData, self).update(*args, **kwargs)
+        self.cn.set_active(self.id, self.get('a'))
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def setdefault(self, key, default=None):
+        value = super(NodeData, self).setdefault(key, default)
+        if key == 'a':
+            self.cn.set_active(self.id, value)
+        return value
+
+    def __delitem__(self, key):
+        super(NodeData, self).__delitem__(key)
+        if key == 'a':
+            self.cn.set_active(self.id, None)
+
+    def pop(self, key, *default):
+        value = super(NodeData, self).pop(key, *default)
+        if key == 'a':
+            self.cn.set_active(self.id, None)
+        return value
+
+    def popitem(self):
+        item = super(NodeData, self).popitem()
+        if item[0] == 'a':
+            self.cn.set_active(self.id, None)
+        return item
+
+    def clear(self):
+        super(NodeData, self).clear()
+        self.cn.set_active(self.id, None)
+
+
 class ConceptNetwork(Network):
     """
     @class ConceptNetwork
@@ -70,10 +194,54 @@ class ConceptNetwork(Network):
     The ConceptNetwork is constructed as an extension of Network.
     We are free to change Network's implementation, since ConceptNetwork
     does not refer to any other python package.
+
+    The network maintains the set of its activated nodes (activation
+    greater than 0), thus propagation only looks at the activated nodes
+    and their neighbours, instead of the whole network.
+    It also caches, for each node, the normalisation of the activation
+    it receives (which only depends on its number of entrant edges).
     """
 
     def __init__(self):
         super(ConceptNetwork, self).__init__()
+        self.active = set()
+        # node id : [in degree, 100 * divlog(in degree)], computed when needed.
+        self._normalisers = dict()
+
+    def set_active(self, id, a):
+        """
+        Updates the set of activated nodes.
+        Called each time the activation of a node is written.
+
+        @param id Node id.
+        @param a New activation of the node.
+        """
+        if a is not None and a > 0:
+            self.active.add(id)
+        else:
+            self.active.discard(id)
+
+    def _watch(self, id):
+        """
+        Replaces the attributes dict of a node with a NodeData
+        and takes its activation into account.
+        """
+        data = self.get_node(id)
+        if type(data) is not NodeData:
+            data = NodeData(self, id, data)
+            self.set_node_data(id, data)
+        self.set_active(id, data.get('a'))
+
+    def _watched(self, id):
+        """
+        @return True if the writes of the attributes of a node are seen.
+        """
+        return type(self.get_node(id)) is NodeData
+
+    def _watch_all(self):
+        self.active = set()
+        for n in self:
+            self._watch(n)
 
     def add_node(self, id, a, ic):
         """
@@ -84,6 +252,37 @@ class ConceptNetwork(Network):
         @param ic Node ic (importance conceptuelle).
         """
         super(ConceptNetwork, self).add_node(id=id, a=a, ic=ic)
+        self._watch(id)
+
+    def add_nodes_from(self, it):
+        """
+        @param it Iterable of [id, dict of attributes].
+        """
+        nodes = list(it)
+        super(ConceptNetwork, self).add_nodes_from(nodes)
+        for n in nodes:
+            self._watch(n[0])
+
+    def remove_node(self, id):
+        for n in list(self.successors(id)):
+            self._normalisers.pop(n, None)
+        self._normalisers.pop(id, None)
+        super(ConceptNetwork, self).remove_node(id)
+        self.active.discard(id)
+
+    def remove_nodes_from(self, ids):
+        ids = [id for id in ids if self.has_node(id)]
+        for id in ids:
+            for n in self.successors(id):
+                self._normalisers.pop(n, None)
+            self._normalisers.pop(id, None)
+        super(ConceptNetwork, self).remove_nodes_from(ids)
+        self.active.difference_update(ids)
+
+    def load_from_JSON(self, filename="temp.json"):
+        super(ConceptNetwork, self).load_from_JSON(filename)
+        self._normalisers = dict()
+        self._watch_all()
 
     def add_edge(self, fromId, toId, w, r, key=0):
         """
@@ -96,9 +295,40 @@ class ConceptNetwork(Network):
             self.add_node(id=fromId, a=0, ic=0)
         if not self.has_node(toId):
             self.add_node(id=toId, a=0, ic=0)
-        if self.network.has_edge(fromId, toId, key):
+        if self.has_edge(fromId, toId, key):
             key += 1
         super(ConceptNetwork, self).add_edge(fromId=fromId, toId=toId, key=key, w=w, r=r)
+        self._normalisers.pop(toId, None)
+
+    def add_edges_from(self, it):
+        """
+        @param it Iterable of [fromId, toId, key, dict of attributes].
+        Nodes which do not exist are created (without attributes).
+        """
+        edges = list(it)
+        super(ConceptNetwork, self).add_edges_from(edges)
+        for e in edges:
+            for id in e[:2]:
+                if not self._watched(id):
+                    self._watch(id)
+        self._normalisers = dict()
+
+    def remove_edge(self, fromId, toId, key=None, all=True):
+        super(ConceptNetwork, self).remove_edge(fromId, toId, key=key, all=all)
+        self._normalisers.pop(toId, None)
+
+    def normaliser(self, id):
+        """
+        @return The divisor of the activation received by a node :
+        100 * divlog(number of entrant edges).
+        It is computed once, and again only if entrant edges change.
+        """
+        cached = self._normalisers.get(id)
+        if cached is None:
+            degree = self.in_degree(id)
+            cached = [degree, 100 * divlog(degree)]
+            self._normalisers[id] = cached
+        return cached[1]
 
     def shortest_path(self, fromId, toId):
         """
@@ -108,13 +338,14 @@ class ConceptNetwork(Network):
 
     def activate(self, id_list, act=60):
         """
-        @warning For now, in case we send to this function
-        bad refactored words, we replace tokens like _+_
-        with _ which represents a white space in the conceptnetwork's
-        nodes.
+        Activate nodes.
+
+        @param id_list Iterable of words, transformed into nodes' id.
+        @param act Activation given to each node.
+        @see node_id
         """
         for id in id_list:
-            self[id.lower().replace(' ', '_').replace('_+_', '_')]['a'] += act
+            self[node_id(id)]['a'] += act
 
     def propagate(self):
         """
@@ -123,22 +354,25 @@ class ConceptNetwork(Network):
 
         Each step, the nodes receive activation from their parents
         and deactivate themselves.
+        Only activated nodes and their successors are considered.
+
+        @return [L1 change, Linf change] of the activation of the nodes.
         """
-        to_deactivate = list()
+        to_deactivate = list(self.active)
         # get all neighbours
         neighbours = dict()
-        for n, d in self.nodes():
-            if d['a'] > 0:
-                to_deactivate.append(n)
-                neighbours[n] = 0
-                for arc in self.out_arcs(n):
-                    neighbours[arc[1]] = 0
+        for n in to_deactivate:
+            neighbours[n] = 0
+            for arc in self.out_arcs(n):
+                neighbours[arc[1]] = 0
         # compute activation for all neighbours
+        previous = dict()
         for n in neighbours:
+            previous[n] = self[n]['a']
             i = 0
             for arc in self.in_arcs(n):
                 i = i + (arc[3]['w'] or 0) * self[arc[0]]['a']
-            i = i / (100 * divlog(len(list(self.in_arcs(n)))))
+            i = i / self.normaliser(n)
             neighbours[n] = int(min(self[n]['a'] + i, 100))
         # change activation
         for n in neighbours:
@@ -146,6 +380,63 @@ class ConceptNetwork(Network):
         # deactivate
         for n in to_deactivate:
             self[n]['a'] = int(self[n]['a'] * (self[n]['ic'] or 100) / 100)  # int(min(self[n]['a'] * (100 - (self[id]['ic'] or 100)) / 100))
+        changes = [abs(self[n]['a'] - previous[n]) for n in neighbours]
+        return [sum(changes), max(changes, default=0)]
+
+    def propagate_until(self, max_steps=20, tol=0, norm='linf', frontier=True):
+        """
+        @brief Propagate until activation is stable.
+
+        Instead of a fixed number of steps, we stop when the activation
+        changes less than tol, or when the set of activated nodes
+        stops growing.
+
+        @return A report : number of steps taken, changes at each step...
+        @see run_until
+        """
+        return run_until(self.propagate, lambda: len(self.active),
+                         max_steps=max_steps, tol=tol, norm=norm, frontier=frontier)
+
+    def sparse_propagator(self):
+        """
+        Compiles the network for fast propagation.
+
+        @return A propagation.SparsePropagator.
+        @see propagation.py
+        """
+        from abstracter.concepts_network.propagation import SparsePropagator
+        return SparsePropagator(self)
+
+    def propagate_batch(self, seed_lists, steps=1, act=60, offset=0):
+        """
+        @brief Propagate several independent activations at once.
+
+        Nodes' attributes are not changed : each list of seeds
+        is propagated as if it were activated alone in the network.
+        The network is compiled for each call ; to run several batches,
+        better keep a propagator (see sparse_propagator).
+
+        @param seed_lists List of lists of words to activate.
+        @param steps Number of propagation steps.
+        @param act Activation given to each seed.
+        @param offset Limit under which we do not rank the nodes.
+        @return For each list of seeds, a list of [node id, activation],
+        most activated first.
+        @see propagation.SparsePropagator.propagate_batch
+        """
+        return self.sparse_propagator().propagate_batch(seed_lists, steps=steps,
+                                                        act=act, offset=offset)
+
+    def session(self):
+        """
+        Creates an activation session : activation and ic
+        are written in the session, not in the network.
+
+        @return A session.ActivationSession.
+        @see session.py
+        """
+        from abstracter.concepts_network.session import ActivationSession
+        return ActivationSession(self)
 
     def print_activated_nodes(self, offset=0):
         """
@@ -154,34 +445,58 @@ class ConceptNetwork(Network):
 
         @param offset Limit under which we do not consider the nodes.
         """
-        for n, d in self.nodes():
-            if d['a'] > offset:
-                print(n + " : " + d['a'].__str__())
+        for n in self.get_activated_nodes(offset):
+            print(n + " : " + self[n]['a'].__str__())
 
     def get_activated_nodes(self, offset=0):
         """
         Returns activated nodes.
 
+        @param offset Limit under which we do not consider the nodes.
+        If it is not negative, only the set of activated nodes is read.
         @return Iterable of strings (nodes' id).
         """
-        for n, d in self.nodes():
-            if d['a'] > offset:
+        if offset < 0:
+            candidates = list(self)
+        else:
+            candidates = list(self.active)
+        for n in candidates:
+            if self[n]['a'] > offset:
                 yield n
 
+    def activated_above(self, offset=0):
+        """
+        @param offset Limit under which we do not consider the nodes.
+        @return The set of nodes' ids whose activation is greater than offset.
+        """
+        return set(self.get_activated_nodes(offset))
+
+    def top_k_activated(self, k):
+        """
+        The k most activated nodes, read from the set of activated
+        nodes (O(a log k), where a is the number of activated nodes).
+
+        @param k Number of nodes wanted.
+        @return A list of [node id, activation], most activated first
+        (ties are sorted by id).
+        """
+        return heapq.nsmallest(k, ([n, self[n]['a']] for n in self.active),
+                               key=lambda x: (-x[1], x[0]))
+
     def print_activated_arcs(self, offset=0):
-        for n1, n2, d in self.edges():
-            if self[n1]['a'] > offset and self[n2]['a'] > offset:
-                # ["wayne_rooney", "athlete", {"w": 39, "r": "IsA"}]
-                print("[\"" + n1 + "\", \"" + n2 + "\", " + d.__repr__() + "]")
+        for n1, n2, d in self.get_activated_arcs(offset):
+            # ["wayne_rooney", "athlete", {"w": 39, "r": "IsA"}]
+            print("[\"" + n1 + "\", \"" + n2 + "\", " + d.__repr__() + "]")
 
     def get_activated_arcs(self, offset=0):
         """
         @return Iterable of lists with [node1 id, node2 id, data]
         where data is a python dict of the edge's information.
         """
-        for n1, n2, d in self.edges():
-            if self[n1]['a'] > offset and self[n2]['a'] > offset:
-                yield [n1, n2, d]
+        for n1 in self.get_activated_nodes(offset):
+            for arc in list(self.out_arcs(n1)):
+                if self[arc[1]]['a'] > offset:
+                    yield [n1, arc[1], arc[3]]
 
     ###########################################
 
@@ -229,6 +544,15 @@ class ConceptNetwork(Network):
             edges_writer.write(e)
         edges_writer.close()
 
+    def save_binary(self, filename):
+        """
+        Saves the network in a binary snapshot, which can be
+        loaded at once with snapshot.load_binary.
+        @see snapshot.py
+        """
+        from abstracter.concepts_network.snapshot import save_binary
+        save_binary(self, filename)
+
     def load(self, arg, directory=""):
         """
         Small util to load a network directory.
@@ -237,9 +561,78 @@ class ConceptNetwork(Network):
 
         @param arg Name of the ConceptNetwork
         @param directory May be "" (current directory) or "../", for example.
+        @see bulk_load
+        """
+        self.bulk_load(arg, directory, verbose=False)
+
+    def bulk_load(self, arg, directory="", processes=0, verbose=True):
+        """
+        @brief Loads a network directory, reading the files by big chunks.
+
+        Lines are decoded by batches (optionally in a pool of processes
+        for the edges file), nodes' ids are interned, so that edges
+        share the strings of the nodes, and each batch is inserted at once.
+        The garbage collector is paused meanwhile : we only create
+        objects, and it would scan them again and again.
+
+        @param arg Name of the ConceptNetwork.
+        @param directory May be "" (current directory) or "../", for example.
+        @param processes Number of processes decoding the edges file
+        (0 : no pool).
+        @param verbose If True, prints the throughput.
+        @return A dict of statistics : nodes, edges, bytes, seconds.
         """
-        self.add_nodes_from(read_json_stream(directory + arg + "/" + arg + "_nodes.jsons"))
-        self.add_edges_from(read_json_stream(directory + arg + "/" + arg + "_edges.jsons"))
+        nodes_file = directory + arg + "/" + arg + "_nodes.jsons"
+        edges_file = directory + arg + "/" + arg + "_edges.jsons"
+        start = time.time()
+        collecting = gc.isenabled()
+        gc.disable()
+        try:
+            nodes = 0
+            for batch in read_json_batches(nodes_file):
+                self.add_nodes_from([sys.intern(n[0]), n[1]] for n in batch)
+                nodes += len(batch)
+            edges = 0
+            for batch in read_json_batches(edges_file, processes=processes):
+                self.add_edges_from([sys.intern(e[0]), sys.intern(e[1])] + e[2:] for e in batch)
+                edges += len(batch)
+        finally:
+            if collecting:
+                gc.enable()
+        stats = {'nodes': nodes, 'edges': edges,
+                 'bytes': os.path.getsize(nodes_file) + os.path.getsize(edges_file),
+                 'seconds': time.time() - start}
+        if verbose:
+            print("Loaded %i nodes and %i edges in %.2f s (%.1f MB/s)." %
+                  (nodes, edges, stats['seconds'],
+                   stats['bytes'] / 1e6 / max(stats['seconds'], 1e-9)))
+        return stats
+
+
+class CompactConceptNetwork(ConceptNetwork, CompactNetwork):
+    """
+    @class CompactConceptNetwork
+    @brief A ConceptNetwork stored in arrays.
+
+    Same methods as ConceptNetwork, using a util.compact_network.CompactNetwork
+    instead of networkx : it takes a fraction of the memory.
+    Use it in place of ConceptNetwork :
+    @code
+    cn = CompactConceptNetwork()
+    cn.load("rc5")
+    @endcode
+    """
+
+    def _watch(self, id):
+        self.set_active(id, self.get_node(id).get('a'))
+
+    def _watched(self, id):
+        # writes are seen by node_attribute_written
+        return True
+
+    def node_attribute_written(self, id, key, value):
+        if key == 'a':
+            self.set_active(id, value)
 
 
 if __name__ == '__main__':
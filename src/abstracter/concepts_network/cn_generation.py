@@ -25,6 +25,10 @@ Each time, you have the choice between :
 * using it on a file (a raw list of words in JSONStream format)
 * using it on the network
 
+In both cases, words are expanded by small batches in a pipeline
+(see run_pipeline) : requests of several batches are running while
+the results of the previous ones are inserted in the network.
+
 We use activation to tag the nodes to keep. Nodes coming directly from
 a file (words from the file) are activated. Nodes created by
 further requests aren't. When you use a method on the network, you can choose
@@ -102,6 +106,16 @@ save_dir("rc5")
 LOG_FILE.close()
 @endcode
 
+A long generation can write checkpoints, and resume after a crash
+from where it stopped : see use_checkpoints.
+
+Counters and timers of the generation (requests, cache, time spent
+selecting words, waiting for requests and inserting, nodes and edges added)
+are written as JSON lines by util.metrics : set util.settings.METRICS_FILE,
+or call metrics.use_file("rc5_metrics.jsons") before the generation.
+Each inserted batch gives a 'batch' event, each use_method_* call a
+'pipeline' event with all the counters and timers.
+
 To every function, the arguments 'limit' or 'max' represent a maximum
 number of nodes to consider. It is useful, to choose between doing
 small tests and creating real-life bigger networks.
@@ -111,8 +125,16 @@ import abstracter.conceptnet5_client.concurrent_api as ca
 from abstracter.concepts_network import ConceptNetwork
 from abstracter.util import json_stream as js
 import abstracter.freebase_client as fb
+from abstracter.util.concurrent import request_stats, close_cache, close_fetcher
+from abstracter.util.word_set import WordSet
+from abstracter.util import metrics
+import codecs
+import json
+import queue
 import re
 import os
+import threading
+import time
 
 
 ############################
@@ -146,7 +168,7 @@ NETWORK = ConceptNetwork()
 # provide any useful result when we tried
 # requests
 ####################################
-BL = set()
+BL = WordSet()
 
 ####################################
 # Success list : contains all words
@@ -155,10 +177,46 @@ BL = set()
 # new requests with these words)
 ######################################
 
-SL = set()
+SL = WordSet()
 
 LOG_FILE = None
 
+####################################
+# Pipeline of use_method_on_file and use_method_on_network :
+# words are sent by batches of BATCH_SIZE, to FETCHERS threads
+# doing the requests ; QUEUE_SIZE batches at most wait
+# to be fetched, and QUEUE_SIZE results to be inserted.
+# Once the pipeline is stopped, its threads check it every
+# STOP_CHECK seconds while waiting on a queue.
+####################################
+
+BATCH_SIZE = 100
+
+FETCHERS = 4
+
+QUEUE_SIZE = 8
+
+STOP_CHECK = 0.1
+
+####################################
+# Checkpoints (see use_checkpoints) : name of the checkpoint directory
+# (None : no checkpoints), and number of batches inserted between
+# two checkpoints.
+####################################
+
+CHECKPOINT = None
+
+CHECKPOINT_EVERY = 20
+
+# Number of use_method_* calls since use_checkpoints.
+_STEP = 0
+
+# Step and position reached by the run we are resuming.
+_RESUME = {'step': 0, 'position': 0, 'count': 0}
+
+# Nodes, edges and words of SL and BL added since the last checkpoint.
+_NEW = {'nodes': [], 'edges': [], 'SL': [], 'BL': []}
+
 
 def print_log(string):
     print(string)
@@ -178,6 +236,8 @@ def create_node(concept, ic=DEFAULT_IC, a=0):
     """
     if not NETWORK.has_node(concept):
         NETWORK.add_node(id=concept, ic=ic, a=a)
+        _journal('nodes', concept)
+        metrics.count('nodes')
         return True
     return False
 
@@ -188,18 +248,26 @@ def create_edge(fromId, toId, weight, rel):
     @return True if the edge has really been created.
     """
     if not NETWORK.has_edge(fromId=fromId, toId=toId):
+        for id in [fromId, toId]:
+            if not NETWORK.has_node(id):
+                _journal('nodes', id)
+                metrics.count('nodes')
         NETWORK.add_edge(fromId=fromId, toId=toId, w=weight, r=rel)
+        _journal('edges', [fromId, toId])
+        metrics.count('edges')
         return True
     return False
 
 
 def add_list(the_list, word):
     """
-    Adding a word to SL or BL (which implementation
-    can be changed).
+    Adding a word to SL or BL (util.word_set.WordSet : only
+    the words added since the list was loaded are kept in memory).
     """
     if word not in the_list:
         the_list.add(word)
+        _journal('SL' if the_list is SL else 'BL', word)
+        metrics.count('SL' if the_list is SL else 'BL')
 
 
 ################################
@@ -207,6 +275,7 @@ def add_list(the_list, word):
 ###################################
 
 
+@metrics.timed()
 def expand_names(words, from_existing=False, to_existing=False):
     """
     Expands a list of names, i.e creates
@@ -215,6 +284,15 @@ def expand_names(words, from_existing=False, to_existing=False):
     @warning words may be a dict or a list
     @see abstracter.freebase_client
     """
+    insert_names(words, query_names(words), from_existing, to_existing)
+
+
+@metrics.timed()
+def query_names(words):
+    """
+    Requests of expand_names.
+    @return A dict word : result.
+    """
     temp = not(type(words) is list)
     try:
         if temp:
@@ -225,6 +303,15 @@ def expand_names(words, from_existing=False, to_existing=False):
         print("Warning,  exception :")
         print(e)
         dict = {}
+    return dict
+
+
+@metrics.timed()
+def insert_names(words, dict, from_existing=False, to_existing=False):
+    """
+    Insertion of the results of query_names in the network.
+    """
+    temp = not(type(words) is list)
     for word in dict:
         data = dict[word]
         # If we didn't get anything, just dismiss the word
@@ -254,6 +341,7 @@ def expand_names(words, from_existing=False, to_existing=False):
             add_list(BL, word)
 
 
+@metrics.timed()
 def expand_edges(words, from_existing=False, to_existing=False):
     """
     Expand edges in the network.
@@ -265,6 +353,15 @@ def expand_edges(words, from_existing=False, to_existing=False):
 
     @see abstracter.conceptnet5_client
     """
+    insert_edges(words, query_edges(words), from_existing, to_existing)
+
+
+@metrics.timed()
+def query_edges(words):
+    """
+    Requests of expand_edges.
+    @return A dict word : list of result.Edge.
+    """
     temp = not(type(words) is list)
     try:
         if temp:
@@ -281,6 +378,15 @@ def expand_edges(words, from_existing=False, to_existing=False):
         print("Warning,  exception :")
         print(e)
         dict = {}
+    return dict
+
+
+@metrics.timed()
+def insert_edges(words, dict, from_existing=False, to_existing=False):
+    """
+    Insertion of the results of query_edges in the network.
+    """
+    temp = not(type(words) is list)
     for word in dict:
         edges = dict[word]
         if edges:
@@ -296,6 +402,7 @@ def expand_edges(words, from_existing=False, to_existing=False):
                     create_edge(fromId=word, toId=e.end, weight=int(min(e.weight * 30, 100)), rel=e.rel)
 
 
+@metrics.timed()
 def expand_lookup(words, from_existing=False, to_existing=False):
     """
     Expand words by a lookup search.
@@ -303,7 +410,15 @@ def expand_lookup(words, from_existing=False, to_existing=False):
 
     @see abstracter.conceptnet5_client
     """
-    temp = not(type(words) is list)
+    insert_lookup(words, query_lookup(words), from_existing, to_existing)
+
+
+@metrics.timed()
+def query_lookup(words):
+    """
+    Requests of expand_lookup.
+    @return A dict word : list of result.Edge.
+    """
     try:
         dict = ca.search_concepts(list(word for word in words),
                                   filter='/c/en/', limit=10)
@@ -311,6 +426,15 @@ def expand_lookup(words, from_existing=False, to_existing=False):
         print("Warning,  exception :")
         print(e)
         dict = {}
+    return dict
+
+
+@metrics.timed()
+def insert_lookup(words, dict, from_existing=False, to_existing=False):
+    """
+    Insertion of the results of query_lookup in the network.
+    """
+    temp = not(type(words) is list)
     for word in dict:
         edges = dict[word]
         if edges:
@@ -333,6 +457,7 @@ def expand_lookup(words, from_existing=False, to_existing=False):
                             weight=int(min(e.weight * 30, 100)), rel=e.rel)
 
 
+@metrics.timed()
 def expand_similarity(words, from_existing=False, to_existing=False):
     """
     Expand words by an association search.
@@ -341,12 +466,29 @@ def expand_similarity(words, from_existing=False, to_existing=False):
 
     @see abstracter.conceptnet5_client
     """
+    insert_similarity(words, query_similarity(words), from_existing, to_existing)
+
+
+@metrics.timed()
+def query_similarity(words):
+    """
+    Requests of expand_similarity.
+    @return A dict word : list of [concept, similarity].
+    """
     try:
         dict = ca.get_similar_concepts(words, limit=3, filter='/c/en/')
     except Exception as e:
         dict = {}
         print("Warning,  exception :")
         print(e)
+    return dict
+
+
+@metrics.timed()
+def insert_similarity(words, dict, from_existing=False, to_existing=False):
+    """
+    Insertion of the results of query_similarity in the network.
+    """
     for word in dict:
         concepts = dict[word]
         if concepts:
@@ -370,80 +512,46 @@ def expand_similarity(words, from_existing=False, to_existing=False):
 ############################################
 
 
-def tag_linked_nodes(limit=1000):
-    k = 0
-    q = 0
+def _tag_nodes(linked, limit):
+    """
+    Reactivates (activation 100) the nodes among the limit + 1 first
+    ones which are not fully activated, and are linked enough.
+
+    @param linked Function (number of predecessors, number of successors) -> bool.
+    """
     print_log("tag linked nodes on current network...")
-    for n, d in NETWORK.nodes():
-        k += 1
-        if NETWORK[n]['a'] < 100 and len(list(NETWORK.predecessors(n))) + len(list(NETWORK.successors(n))) > 1:
-            NETWORK[n]['a'] = 100
-            q += 1
-            if q % 100 == 0:
-                print(q.__str__() + " nodes reactivated !")
-        if k % 500 == 0:
-            print(k.__str__() + " nodes looked !")
-        if k > limit:
-            break
-    print_log(k.__str__() + " nodes looked !")
-    print_log(q.__str__() + " nodes reactivated !")
+    # neighbours are only counted for the nodes looked at
+    selected = NETWORK.select_nodes(
+        lambda n, d: d['a'] < 100 and linked(*NETWORK.neighbour_counts(n)), limit=limit + 1)
+    for n in selected:
+        NETWORK[n]['a'] = 100
+    print_log(min(NETWORK.number_of_nodes(), limit + 1).__str__() + " nodes looked !")
+    print_log(len(selected).__str__() + " nodes reactivated !")
+
+
+def tag_linked_nodes(limit=1000):
+    _tag_nodes(lambda p, s: p + s > 1, limit)
 
 
 def tag_less_linked_nodes(limit=1000):
-    k = 0
-    q = 0
-    print_log("tag linked nodes on current network...")
-    for n, d in NETWORK.nodes():
-        k += 1
-        if NETWORK[n]['a'] < 100 and len(list(NETWORK.predecessors(n))) + len(list(NETWORK.successors(n))) >= 1:
-            NETWORK[n]['a'] = 100
-            q += 1
-            if q % 100 == 0:
-                print(q.__str__() + " nodes reactivated !")
-        if k % 500 == 0:
-            print(k.__str__() + " nodes looked !")
-        if k > limit:
-            break
-    print_log(k.__str__() + " nodes looked !")
-    print_log(q.__str__() + " nodes reactivated !")
+    _tag_nodes(lambda p, s: p + s >= 1, limit)
 
 
 def tag_much_linked_nodes(limit=1000):
-    k = 0
-    q = 0
-    print_log("tag linked nodes on current network...")
-    for n, d in NETWORK.nodes():
-        k += 1
-        if NETWORK[n]['a'] < 100 and len(list(NETWORK.predecessors(n))) > 1:
-            NETWORK[n]['a'] = 100
-            q += 1
-            if q % 100 == 0:
-                print(q.__str__() + " nodes reactivated !")
-        if k % 500 == 0:
-            print(k.__str__() + " nodes looked !")
-        if k > limit:
-            break
-    print_log(k.__str__() + " nodes looked !")
-    print_log(q.__str__() + " nodes reactivated !")
+    _tag_nodes(lambda p, s: p > 1, limit)
 
 
 def clear_nodes(filter='a', limit=1000):
-    k = 0
-    q = 0
+    """
+    Removes, among the limit + 1 first nodes, the ones whose
+    attribute filter is 0.
+    """
     print_log("clear nodes on current network with filter " + filter)
-    for n in NETWORK.nodes().copy():
-        k += 1
-        if NETWORK[n[0]][filter] == 0:
-            NETWORK.remove_node(n[0])
-            q += 1
-            if q % 200 == 0:
-                print(q.__str__() + " nodes removed !")
-        if k % 5000 == 0:
-            print(k.__str__() + " nodes looked !")
-        if k > limit:
-            break
-    print_log(k.__str__() + " nodes looked !")
-    print_log(q.__str__() + " nodes removed !")
+    looked = min(NETWORK.number_of_nodes(), limit + 1)
+    selected = NETWORK.select_nodes(lambda n, d: d[filter] == 0, limit=limit + 1)
+    NETWORK.remove_nodes_from(selected)
+    print_log(looked.__str__() + " nodes looked !")
+    print_log(len(selected).__str__() + " nodes removed !")
 
 
 def clear_ic(limit):
@@ -456,14 +564,8 @@ def clear_act(limit):
 
 def deactivate_nodes(limit=1000):
     print_log("deactivate nodes...")
-    k = 0
-    for n in NETWORK.nodes():
-        NETWORK[n[0]]['a'] = 0
-        k += 1
-        if k % 500 == 0:
-            print(k.__str__() + " nodes looked !")
-        if k > limit:
-            break
+    for n in NETWORK.select_nodes(lambda n, d: True, limit=limit + 1):
+        NETWORK[n]['a'] = 0
     print_log("done !")
 
 
@@ -477,52 +579,251 @@ def activate_nodes():
 ##########################################
 
 
-def use_method_on_file(file, expand_method, max, to_existing, from_existing):
+###########################
+# Requests and insertion of each expand method.
+############################
+
+STAGES = {expand_names: (query_names, insert_names),
+          expand_edges: (query_edges, insert_edges),
+          expand_lookup: (query_lookup, insert_lookup),
+          expand_similarity: (query_similarity, insert_similarity)}
+
+
+def _stages(expand_method):
+    """
+    @return (query, insert) of an expand method.
+    A method which is not in STAGES has no separate requests : it is run
+    as a single insertion stage (it does its requests while inserting).
+    """
+    if expand_method in STAGES:
+        return STAGES[expand_method]
+
+    def insert(words, found, from_existing=False, to_existing=False):
+        expand_method(words, from_existing=from_existing, to_existing=to_existing)
+    return (lambda words: {}), insert
+
+
+def run_pipeline(batches, expand_method, to_existing, from_existing,
+                 fetchers=FETCHERS, queue_size=QUEUE_SIZE, keep=None):
+    """
+    @brief Expands batches of words, requests and insertion overlapping.
+
+    A thread reads the batches, fetchers threads do the requests
+    (query_* functions), and the results are inserted in the network
+    (insert_* functions) by the calling thread, as soon as they arrive.
+    Queues between them are bounded, so words are not selected
+    much ahead of the insertion. At the end (or on an exception),
+    the threads are stopped and joined before the shared Fetcher is closed.
+
+    If checkpoints are enabled, a checkpoint is written every
+    CHECKPOINT_EVERY inserted batches, with the position of the last
+    batch such that all the batches before it are inserted.
+
+    @param batches Iterable of [batch of words, position] : batches of words
+    are dicts or lists (see expand methods), position is a dict
+    {'position', 'count'} giving where to resume after the batch.
+    It is read in another thread ; an exception raised while reading it
+    is raised again by run_pipeline.
+    @param expand_method The expand method (see STAGES, and _stages
+    for other methods).
+    @param fetchers Number of threads doing requests.
+    @param queue_size Maximum number of batches waiting in each queue.
+    @param keep Function word -> bool, or None. Batches are selected
+    ahead of the insertion, so a word may be inserted meanwhile
+    (by a previous batch) : keep is checked again just before insertion,
+    and the words (and their results) it rejects are not inserted.
+    @see util.concurrent.close_fetcher The shared Fetcher is closed at the end.
+    """
+    query, insert = _stages(expand_method)
+    to_fetch = queue.Queue(queue_size)
+    fetched = queue.Queue(queue_size)
+    stop = threading.Event()
+
+    def put(q, item):
+        """
+        @return False if the pipeline was stopped (item not put).
+        """
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=STOP_CHECK)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def get(q):
+        """
+        @return The next item, or None if the pipeline was stopped.
+        """
+        while not stop.is_set():
+            try:
+                return q.get(timeout=STOP_CHECK)
+            except queue.Empty:
+                pass
+        return None
+
+    def drain(q):
+        try:
+            while True:
+                q.get_nowait()
+        except queue.Empty:
+            pass
+
+    def produce():
+        try:
+            for number, batch in enumerate(metrics.timed_iter(batches, 'pipeline.select')):
+                if not put(to_fetch, [number] + batch):
+                    break
+        except BaseException as e:
+            # raised again by the inserting thread, before the step is finished
+            put(fetched, e)
+        finally:
+            for i in range(fetchers):
+                put(to_fetch, None)
+
+    def fetch():
+        try:
+            batch = get(to_fetch)
+            while batch is not None:
+                if not put(fetched, batch + [query(batch[1])]):
+                    break
+                batch = get(to_fetch)
+        except BaseException as e:
+            # raised again by the inserting thread
+            put(fetched, e)
+        finally:
+            close_cache()
+            put(fetched, None)
+
+    threads = [threading.Thread(target=produce, daemon=True)]
+    threads += [threading.Thread(target=fetch, daemon=True) for i in range(fetchers)]
+    for t in threads:
+        t.start()
+    finished = 0
+    # positions of the inserted batches, until all previous ones are inserted
+    inserted = dict()
+    done = 0
+    start = time.time()
+    counters = metrics.snapshot()['counters']
+    try:
+        while finished < fetchers:
+            with metrics.timer('pipeline.wait'):
+                result = fetched.get()
+            if result is None:
+                finished += 1
+                continue
+            if isinstance(result, BaseException):
+                raise result
+            number, words, position, found = result
+            if keep is not None:
+                if type(words) is list:
+                    words = [w for w in words if keep(w)]
+                else:
+                    words = dict((w, words[w]) for w in words if keep(w))
+                found = dict((w, found[w]) for w in found if keep(w))
+            inserting = time.time()
+            insert(words, found, from_existing=from_existing, to_existing=to_existing)
+            metrics.write('batch', method=expand_method.__name__, number=number,
+                          words=len(words), found=len(found), position=position['position'],
+                          seconds=time.time() - inserting)
+            inserted[number] = position
+            while done in inserted:
+                position = inserted.pop(done)
+                done += 1
+                if CHECKPOINT and done % CHECKPOINT_EVERY == 0:
+                    checkpoint(position)
+    finally:
+        stop.set()
+        # a fetcher still running a request uses the shared Fetcher
+        for t in threads:
+            while t.is_alive():
+                drain(to_fetch)
+                drain(fetched)
+                t.join(STOP_CHECK)
+        # session and event loop of the requests
+        close_fetcher()
+    print_log("Requests since the beginning : %(urls)i urls, %(fetched)i fetched, "
+              "%(saved)i saved (%(duplicates)i duplicates, %(memory)i in memory, "
+              "%(coalesced)i coalesced, %(cache)i in cache), %(failed)i failed." % request_stats())
+    seconds = time.time() - start
+    added = dict((key, metrics.snapshot()['counters'].get(key, 0) - counters.get(key, 0))
+                 for key in ['nodes', 'edges'])
+    metrics.report('pipeline', method=expand_method.__name__, batches=done, seconds=seconds,
+                   nodes=added['nodes'], edges=added['edges'],
+                   nodes_per_second=added['nodes'] / max(seconds, 1e-9),
+                   edges_per_second=added['edges'] / max(seconds, 1e-9))
+
+
+@metrics.timed()
+def use_method_on_file(file, expand_method, max, to_existing, from_existing,
+                       batch_size=BATCH_SIZE):
     """
     @brief Use a specified method on a file.
 
     We may have a lot of words to consider (10 000, for example). We create
-    dicts of 500 words, calling the method (and doing concurrent requests)
-    on each one.
+    dicts of batch_size words, which are expanded in a pipeline : while
+    the results of a batch are inserted, the requests of the next
+    ones are running.
 
     @param file name of the file. It has to be JSONStream readable ;
     more precisely, we await on each line a tuple [word, number] where
     number represents a number of occurrences.
 
     @param expand_method The method to use.
+    @see run_pipeline
+    @see use_checkpoints
     """
+    step = _start_step()
+    if step is None:
+        return
     print_log("Using method " +
               expand_method.__name__ +
               " on file " + file.__repr__() + "...")
     print_log("to_existing_nodes : " +
               to_existing.__str__() + ",  from_existing : " +
               from_existing.__str__())
-    dict = {}
-    k = 0
-    for w in js.read_json_stream(file):
-        if (re.match('^[a-zA-Z\s-]*$', w[0])
-           and len(w[0]) < 20 and w[1] > 0 and not w[0] in SL
-           and not w[0] in BL and not NETWORK.has_node(w[0])):
-            dict[w[0]] = w[1]
-            k += 1
-            if len(dict) > 500:
-                expand_method(words=dict, to_existing=to_existing,
-                              from_existing=from_existing)
-                dict = {}
-            if k > max:
-                break
-    if len(dict) > 0:
-        expand_method(words=dict, to_existing=to_existing,
-                      from_existing=from_existing)
-    print_log("Looked at " + k.__str__() + " elements.")
+    count = [step['count']]
 
+    def new(word):
+        return not word in SL and not word in BL and not NETWORK.has_node(word)
 
+    def batches():
+        dict = {}
+        k = step['count']
+        for line, w in enumerate(js.read_json_stream(file)):
+            if line < step['position']:
+                continue
+            if (re.match('^[a-zA-Z\s-]*$', w[0])
+               and len(w[0]) < 20 and w[1] > 0 and new(w[0])):
+                dict[w[0]] = w[1]
+                k += 1
+                count[0] = k
+                if len(dict) >= batch_size:
+                    yield [dict, {'position': line + 1, 'count': k}]
+                    dict = {}
+                if k > max:
+                    break
+        if len(dict) > 0:
+            yield [dict, {'position': line + 1, 'count': k}]
+
+    # new is checked again at insertion (see run_pipeline)
+    run_pipeline(batches(), expand_method, to_existing=to_existing,
+                 from_existing=from_existing, keep=new)
+    _end_step()
+    print_log("Looked at " + count[0].__str__() + " elements.")
+
+
+@metrics.timed()
 def use_method_on_network(expand_method, max, to_existing,
-                          from_existing, act=True, not_act=True):
+                          from_existing, act=True, not_act=True,
+                          batch_size=BATCH_SIZE):
     """
     @brief Use a specified method on the network.
 
-    The principle is similar to use_method_on_file.
+    The principle is similar to use_method_on_file. Nodes are chosen
+    before the expansion begins (nodes created meanwhile are not expanded),
+    in alphabetical order. With checkpoints, the chosen nodes are saved
+    (see _save_selection), thus a resumed run expands the same ones.
 
     @param expand_method the method to use.
     @param act if we check activated nodes.
@@ -533,24 +834,168 @@ def use_method_on_network(expand_method, max, to_existing,
               ",  from_existing : " + from_existing.__str__() +
               ",  activated :" + act.__str__() +
               ",  not activated :" + not_act.__str__())
-    list = []
-    k = 0
-    for n, d in NETWORK.nodes():
-        if ((not_act and d['a'] == 0) or (act and d['a'] > 0)):
-            list.append(n)
-            k += 1
-        else:
-            pass
-        if len(list) > 500:
-            expand_method(words=list, to_existing=to_existing, from_existing=from_existing)
-            list = []
-        if k > max:
-            break
-    if len(list) > 0:
-        expand_method(words=list, to_existing=to_existing, from_existing=from_existing)
+    step = _start_step()
+    if step is None:
+        return
+    list = _load_selection()
+    if list is None:
+        list = []
+        for n, d in sorted(NETWORK.nodes()):
+            if ((not_act and d['a'] == 0) or (act and d['a'] > 0)):
+                list.append(n)
+            if len(list) > max:
+                break
+        _save_selection(list)
+    k = len(list)
+    batches = ([list[i:i + batch_size], {'position': i + batch_size, 'count': i + batch_size}]
+               for i in range(step['position'], len(list), batch_size))
+    run_pipeline(batches, expand_method, to_existing=to_existing, from_existing=from_existing)
+    _end_step()
     print_log("Looked at " + k.__str__() + " nodes.")
 
 ####################################################
+# Checkpoints
+##########################################
+
+
+def use_checkpoints(name, every=CHECKPOINT_EVERY):
+    """
+    @brief Writes checkpoints of the generation, and resumes a stopped one.
+
+    Call it before the first use_method_* call (after loading the
+    network we start from, if any). Nodes, edges, SL and BL
+    are appended to the files of the directory name (like save_dir), and
+    name_checkpoint.json records the use_method_* call we are in, and the
+    position reached in its words. If the directory already contains a
+    checkpoint, it is loaded : use_method_* calls which were finished
+    are skipped, and the one which was stopped resumes from its position.
+
+    Example (run again the same script after a crash) :
+    @code
+    use_checkpoints("rc_checkpoint")
+    use_method_on_file(DATA_DIR + "names_2015_03_29.jsons", expand_names, max=1000, to_existing=False, from_existing=False)
+    use_method_on_network(expand_edges, max=100000, to_existing=True, from_existing=False, not_act=True, act=False)
+    clear_act(limit=100000)
+    save_dir("rc")
+    @endcode
+
+    @warning Checkpoints only record expansions : network treatments
+    (tag_*, clear_*...) are run again when the script is run again.
+    @param every Number of batches inserted between two checkpoints.
+    """
+    global CHECKPOINT, CHECKPOINT_EVERY, _STEP, _RESUME
+    CHECKPOINT = name
+    CHECKPOINT_EVERY = every
+    _STEP = 0
+    _RESUME = {'step': 0, 'position': 0, 'count': 0}
+    state = name + "/" + name + "_checkpoint.json"
+    if os.path.isfile(state):
+        with open(state) as file:
+            _RESUME = json.load(file)
+        print_log("Resuming from checkpoint " + name + " (step %i, position %i)..." %
+                  (_RESUME['step'], _RESUME['position']))
+        load_dir(name)
+    else:
+        if not os.path.isdir(name):
+            os.makedirs(name)
+        for suffix in ["_nodes.jsons", "_edges.jsons", "_black_list.jsons", "_success_list.jsons"]:
+            open(name + "/" + name + suffix, 'w').close()
+        # Lists saved by save_dir would be loaded instead of the checkpointed ones.
+        for suffix in ["_black_list.words", "_black_list.bloom",
+                       "_success_list.words", "_success_list.bloom", "_selection.json"]:
+            if os.path.isfile(name + "/" + name + suffix):
+                os.remove(name + "/" + name + suffix)
+    for key in _NEW:
+        _NEW[key] = []
+
+
+def _journal(kind, item):
+    """
+    Records a node, edge or word added since the last checkpoint.
+    """
+    if CHECKPOINT:
+        _NEW[kind].append(item)
+
+
+def _append(suffix, lines):
+    with codecs.open(CHECKPOINT + "/" + CHECKPOINT + suffix, 'a', encoding='utf-8') as file:
+        writer = js.JSONStreamWriter(file)
+        for line in lines:
+            writer.write(line)
+
+
+def checkpoint(position):
+    """
+    @brief Appends what was added since the last checkpoint, and records the position.
+
+    @param position A dict {'position', 'count'} : where the current
+    use_method_* call will resume.
+    """
+    _append("_nodes.jsons", [[n, NETWORK[n]] for n in _NEW['nodes'] if NETWORK.has_node(n)])
+    _append("_edges.jsons", [[e[0], e[1], NETWORK.get_edge(e[0], e[1])] for e in _NEW['edges']
+                             if NETWORK.has_edge(e[0], e[1])])
+    _append("_success_list.jsons", _NEW['SL'])
+    _append("_black_list.jsons", _NEW['BL'])
+    for key in _NEW:
+        _NEW[key] = []
+    state = CHECKPOINT + "/" + CHECKPOINT + "_checkpoint.json"
+    with open(state + ".tmp", 'w') as file:
+        json.dump({'step': _STEP, 'position': position['position'],
+                   'count': position['count']}, file)
+    os.replace(state + ".tmp", state)
+
+
+def _save_selection(words):
+    """
+    Records the nodes chosen by the current use_method_on_network call.
+    Nodes added by the call are reloaded by a resumed run, thus
+    choosing the nodes again would not give the same ones.
+    """
+    if not CHECKPOINT:
+        return
+    selection = CHECKPOINT + "/" + CHECKPOINT + "_selection.json"
+    with open(selection + ".tmp", 'w') as file:
+        json.dump({'step': _STEP, 'words': words}, file)
+    os.replace(selection + ".tmp", selection)
+
+
+def _load_selection():
+    """
+    @return The nodes chosen by the use_method_on_network call we resume,
+    or None if they have to be chosen.
+    """
+    if not CHECKPOINT or _STEP != _RESUME['step']:
+        return None
+    selection = CHECKPOINT + "/" + CHECKPOINT + "_selection.json"
+    if not os.path.isfile(selection):
+        return None
+    with open(selection) as file:
+        saved = json.load(file)
+    return saved['words'] if saved['step'] == _STEP else None
+
+
+def _start_step():
+    """
+    Beginning of a use_method_* call.
+    @return None if the call was finished in the run we resume,
+    otherwise the position where to start.
+    """
+    if not CHECKPOINT or _STEP > _RESUME['step']:
+        return {'position': 0, 'count': 0}
+    if _STEP < _RESUME['step']:
+        print_log("Already done (checkpoint).")
+        _end_step(write=False)
+        return None
+    return {'position': _RESUME['position'], 'count': _RESUME['count']}
+
+
+def _end_step(write=True):
+    global _STEP
+    _STEP += 1
+    if CHECKPOINT and write:
+        checkpoint({'position': 0, 'count': 0})
+
+####################################################
 
 
 def load_dir(name):
@@ -560,16 +1005,24 @@ def load_dir(name):
     For example, load_dir("rc") will attempt to load :
     * rc/rc_nodes.jsons
     * rc/rc_edges.jsons
-    * rc/rc_black_list.jsons
-    * rc/rc_success_list.jsons
+    * rc/rc_black_list.words and rc/rc_black_list.bloom
+    (or rc/rc_black_list.jsons, written by former versions and checkpoints)
+    * rc/rc_success_list.words and rc/rc_success_list.bloom
+    (or rc/rc_success_list.jsons)
     """
     print_log("Loading network " + name + "...")
     NETWORK.load_from_JSON_stream(nodes_files=[name + "/" + name + "_nodes.jsons"],
                                   edges_files=[name + "/" + name + "_edges.jsons"])
-    for n in js.read_json_stream(name + "/" + name + "_black_list.jsons"):
-        add_list(BL, n[0])
-    for n in js.read_json_stream(name + "/" + name + "_success_list.jsons"):
-        add_list(SL, n[0])
+    _load_list(BL, name + "/" + name + "_black_list")
+    _load_list(SL, name + "/" + name + "_success_list")
+
+
+def _load_list(the_list, filename):
+    if WordSet.exists(filename):
+        the_list.open(filename)
+        return
+    for n in js.read_json_stream(filename + ".jsons"):
+        add_list(the_list, n if isinstance(n, str) else n[0])
 
 
 def save_dir(name):
@@ -580,8 +1033,8 @@ def save_dir(name):
     if not os.path.isdir(name):
         os.makedirs(name)
     NETWORK.save_to_JSON_stream(name + "/" + name)
-    js.write_json_stream(list(BL), name + "/" + name + "_black_list.jsons")
-    js.write_json_stream(list(SL), name + "/" + name + "_success_list.jsons")
+    BL.save(name + "/" + name + "_black_list")
+    SL.save(name + "/" + name + "_success_list")
 
 
 def print_network_status():
@@ -596,6 +1049,8 @@ def print_network_status():
     print_log("%i nodes are activated (thus will be kept)." % q)
     print_log("Current black list has %i entries" % (len(BL)))
     print_log("Current success list has %i entries\n\n" % (len(SL)))
+    metrics.write('network_status', nodes=len(NETWORK.nodes()), edges=len(NETWORK.edges()),
+                  activated=q, black_list=len(BL), success_list=len(SL))
 
 
 def creation_demo(namesfile, conceptsfile):
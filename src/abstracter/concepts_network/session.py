@@ -0,0 +1,159 @@
+"""@file session.py
+@brief Activation sessions : several activations of one ConceptNetwork.
+
+ConceptNetwork.activate and ConceptNetwork.propagate write activation
+into the network itself (and WorkspacePrunner.push_activation even
+changes ics), so a loaded network can be used only once.
+
+An ActivationSession holds the activation and ic written during one
+run, on top of a ConceptNetwork which is never modified. A service can
+thus load rc5 once and serve many documents, for example one session
+per thread, without copying the network.
+
+Example :
+@code
+from abstracter.concepts_network import ConceptNetwork
+import abstracter.albertTheAlgorithm.workspacePrunner as wksP
+
+cn = ConceptNetwork()
+cn.load("rc5")
+
+session = cn.session()
+session.activate(["wayne_rooney", "steven_gerrard"])
+for i in range(4):
+    session.propagate()
+session.print_activated_nodes(9)
+
+wp = wksP.WorkspacePrunner(wks, cn.session())
+@endcode
+
+@warning The ConceptNetwork must not be modified while sessions are used.
+"""
+
+from abstracter.concepts_network import ConceptNetwork
+
+
+class SessionNode:
+    """
+    @class SessionNode
+    @brief Attributes of a node, seen through a session.
+
+    It behaves like the attributes dict of the node : reads
+    return the value written in the session if any, the value of
+    the ConceptNetwork otherwise ; writes only go to the session.
+    """
+    __slots__ = ['session', 'id']
+
+    def __init__(self, session, id):
+        self.session = session
+        self.id = id
+
+    def __getitem__(self, key):
+        return self.session.get_attribute(self.id, key)
+
+    def __setitem__(self, key, value):
+        self.session.set_attribute(self.id, key, value)
+
+    def __contains__(self, key):
+        return key in self.session.node_data(self.id)
+
+    def get(self, key, default=None):
+        return self.session.node_data(self.id).get(key, default)
+
+    def __repr__(self):
+        return self.session.node_data(self.id).__repr__()
+
+
+class ActivationSession:
+    """
+    @class ActivationSession
+    @brief Copy-on-write activation over a ConceptNetwork.
+
+    A session has the same activation methods as a ConceptNetwork
+    (activate, propagate, get_activated_nodes...), which use the
+    same code. Only nodes written during the session are stored.
+    """
+
+    def __init__(self, cn):
+        """
+        @param cn The ConceptNetwork the session is based on.
+        Its activated nodes are activated in the session.
+        """
+        self.cn = cn
+        # node id : dict of the attributes written in this session.
+        self.overlay = dict()
+        self.active = set(cn.active)
+
+    def reset(self):
+        """
+        Forgets everything written in the session.
+        """
+        self.overlay = dict()
+        self.active = set(self.cn.active)
+
+    def get_attribute(self, id, key):
+        written = self.overlay.get(id)
+        if written is not None and key in written:
+            return written[key]
+        return self.cn.get_node(id)[key]
+
+    def set_attribute(self, id, key, value):
+        if id not in self.overlay:
+            self.overlay[id] = dict()
+        self.overlay[id][key] = value
+        if key == 'a':
+            self.set_active(id, value)
+
+    def node_data(self, id):
+        """
+        @return A dict of the attributes of a node, as seen in the session.
+        """
+        data = dict(self.cn.get_node(id))
+        data.update(self.overlay.get(id, {}))
+        return data
+
+    def __getitem__(self, id):
+        if self.cn.has_node(id):
+            return SessionNode(self, id)
+        return None
+
+    def __contains__(self, id):
+        return self.cn.has_node(id)
+
+    def __iter__(self):
+        return iter(self.cn)
+
+    def has_node(self, id):
+        return self.cn.has_node(id)
+
+    def has_edge(self, fromId, toId, key=None):
+        return self.cn.has_edge(fromId, toId, key)
+
+    def out_arcs(self, id):
+        return self.cn.out_arcs(id)
+
+    def in_arcs(self, id):
+        return self.cn.in_arcs(id)
+
+    def normaliser(self, id):
+        return self.cn.normaliser(id)
+
+    def nodes(self, data=True):
+        if data:
+            return [(n, self.node_data(n)) for n in self.cn]
+        return self.cn.nodes(data=False)
+
+    def edges(self, data=True):
+        return self.cn.edges(data=data)
+
+    # activation, exactly as in the ConceptNetwork
+    set_active = ConceptNetwork.set_active
+    activate = ConceptNetwork.activate
+    propagate = ConceptNetwork.propagate
+    propagate_until = ConceptNetwork.propagate_until
+    get_activated_nodes = ConceptNetwork.get_activated_nodes
+    print_activated_nodes = ConceptNetwork.print_activated_nodes
+    activated_above = ConceptNetwork.activated_above
+    top_k_activated = ConceptNetwork.top_k_activated
+    get_activated_arcs = ConceptNetwork.get_activated_arcs
+    print_activated_arcs = ConceptNetwork.print_activated_arcs
@@ -0,0 +1,368 @@
+"""@file snapshot.py
+@brief Binary snapshots of a ConceptNetwork.
+
+Loading a network from its .jsons files parses every line
+(several seconds for rc5, paid by every script at startup).
+A snapshot is a single binary file containing :
+* nodes' ids, sorted, encoded in utf-8,
+* activation and ic of each node (32 bits integers),
+* edges, as a CSR adjacency (edges grouped by start node)
+with weights, relations and keys,
+* for each node, the numbers of its entrant edges.
+
+load_binary maps the file in memory (mmap) : nothing is parsed,
+strings are only decoded when they are read, and the network can
+be used immediately. The result is a read-only SnapshotNetwork ;
+activation is done in sessions (see session.py).
+
+Example :
+@code
+from abstracter.concepts_network.snapshot import convert_directory, load_binary
+
+convert_directory("rc5")  # once : writes rc5/rc5.cnbin
+
+snapshot = load_binary("rc5/rc5.cnbin")
+session = snapshot.session()
+session.activate(["wayne_rooney", "steven_gerrard"])
+for i in range(4):
+    session.propagate()
+session.print_activated_nodes(9)
+
+cn = snapshot.to_concept_network()  # if we need to modify the network
+@endcode
+
+@warning Activations and ics are stored as integers, weights as floats
+(integral weights are read as int), None is stored as 0.
+The file uses the native byte order of the machine.
+"""
+
+from abstracter.concepts_network import ConceptNetwork, divlog
+from array import array
+import mmap
+import struct
+import sys
+from types import MappingProxyType
+
+###########################
+# Header : magic string, then number of nodes, edges,
+# relations, size of the nodes' ids and relations' names.
+############################
+
+MAGIC = b'CNSNAP1' + sys.byteorder[0].upper().encode('ascii')
+
+_HEADER = struct.Struct('8sQQQQQ')
+
+###########################
+# Extension of snapshot files.
+############################
+
+EXTENSION = ".cnbin"
+
+
+def _align(offset):
+    return (offset + 7) // 8 * 8
+
+
+def _layout(n, e, r, names_size, relations_size):
+    """
+    @return A list of (section name, typecode, length), in the order of the file.
+    """
+    return [('name_offsets', 'q', n + 1),
+            ('names', 'B', names_size),
+            ('a', 'i', n),
+            ('ic', 'i', n),
+            ('out_ptr', 'q', n + 1),
+            ('out_dst', 'i', e),
+            ('out_w', 'd', e),
+            ('out_key', 'i', e),
+            ('out_r', 'H', e),
+            ('in_ptr', 'q', n + 1),
+            ('in_src', 'i', e),
+            ('in_edge', 'i', e),
+            ('relation_offsets', 'q', r + 1),
+            ('relations', 'B', relations_size)]
+
+
+def _strings(strings):
+    """
+    @return Offsets (array) and blob (bytes) of a list of strings.
+    """
+    offsets = array('q', [0])
+    encoded = [s.encode('utf-8') for s in strings]
+    for s in encoded:
+        offsets.append(offsets[-1] + len(s))
+    return offsets, b''.join(encoded)
+
+
+def _int(value):
+    return int(value or 0)
+
+
+def save_binary(cn, filename):
+    """
+    @brief Writes a snapshot of a network.
+
+    @param cn A ConceptNetwork (or CompactConceptNetwork, or SnapshotNetwork).
+    Nodes' ids must be strings, edges' keys integers.
+    @param filename Name of the file to create.
+    """
+    nodes = cn.nodes()
+    nodes.sort(key=lambda n: n[0].encode('utf-8'))
+    index = dict((n[0], i) for i, n in enumerate(nodes))
+    name_offsets, names = _strings([n[0] for n in nodes])
+    a = array('i', [_int(d.get('a')) for n, d in nodes])
+    ic = array('i', [_int(d.get('ic')) for n, d in nodes])
+    relations = []
+    relation_numbers = dict()
+    out_ptr = array('q', [0])
+    out_dst = array('i')
+    out_w = array('d')
+    out_key = array('i')
+    out_r = array('H')
+    numbers = dict()
+    for n, d in nodes:
+        i = index[n]
+        for arc in cn.out_arcs(n):
+            j = index[arc[1]]
+            numbers[(i, j, arc[2])] = len(out_dst)
+            r = arc[3].get('r')
+            if r not in relation_numbers:
+                relation_numbers[r] = len(relations)
+                relations.append(r)
+            out_dst.append(j)
+            out_w.append(arc[3].get('w') or 0)
+            out_key.append(arc[2])
+            out_r.append(relation_numbers[r])
+        out_ptr.append(len(out_dst))
+    in_ptr = array('q', [0])
+    in_src = array('i')
+    in_edge = array('i')
+    for n, d in nodes:
+        j = index[n]
+        for arc in cn.in_arcs(n):
+            i = index[arc[0]]
+            in_src.append(i)
+            in_edge.append(numbers[(i, j, arc[2])])
+        in_ptr.append(len(in_src))
+    relation_offsets, relation_names = _strings([r or "" for r in relations])
+    sections = {'name_offsets': name_offsets, 'names': names, 'a': a, 'ic': ic,
+                'out_ptr': out_ptr, 'out_dst': out_dst, 'out_w': out_w,
+                'out_key': out_key, 'out_r': out_r, 'in_ptr': in_ptr,
+                'in_src': in_src, 'in_edge': in_edge,
+                'relation_offsets': relation_offsets, 'relations': relation_names}
+    with open(filename, 'wb') as file:
+        file.write(_HEADER.pack(MAGIC, len(nodes), len(out_dst), len(relations),
+                                len(names), len(relation_names)))
+        offset = _HEADER.size
+        for name, typecode, length in _layout(len(nodes), len(out_dst), len(relations),
+                                              len(names), len(relation_names)):
+            file.write(b'\0' * (_align(offset) - offset))
+            data = bytes(sections[name])
+            file.write(data)
+            offset = _align(offset) + len(data)
+
+
+def load_binary(filename):
+    """
+    @return A SnapshotNetwork, mapped from the file.
+    """
+    return SnapshotNetwork(filename)
+
+
+def convert_directory(arg, directory=""):
+    """
+    Converts a network directory, like ConceptNetwork.load does :
+    "rc5" gives "rc5/rc5.cnbin" from "rc5/rc5_nodes.jsons" and "rc5/rc5_edges.jsons".
+
+    @return The name of the snapshot file.
+    """
+    from abstracter.concepts_network import CompactConceptNetwork
+    cn = CompactConceptNetwork()
+    cn.load(arg, directory)
+    filename = directory + arg + "/" + arg + EXTENSION
+    save_binary(cn, filename)
+    return filename
+
+
+class SnapshotNetwork:
+    """
+    @class SnapshotNetwork
+    @brief A read-only ConceptNetwork, mapped from a snapshot file.
+
+    It has the reading methods of a ConceptNetwork ; n[id] gives
+    the attributes of the node, read-only (writing them raises a TypeError :
+    activation is done in sessions).
+    """
+
+    def __init__(self, filename):
+        self.file = open(filename, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, n, e, r, names_size, relations_size = _HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC:
+            raise ValueError(filename + " is not a snapshot (or has another byte order).")
+        self.number_of_nodes = n
+        self.number_of_edges = e
+        view = memoryview(self.map)
+        offset = _HEADER.size
+        for name, typecode, length in _layout(n, e, r, names_size, relations_size):
+            offset = _align(offset)
+            size = length * struct.calcsize(typecode)
+            setattr(self, '_' + name, view[offset:offset + size].cast(typecode))
+            offset += size
+        self._relation_names = [self._string(self._relation_offsets, self._relations, k)
+                                for k in range(r)]
+        self._found = dict()
+        self.active = set(self._name(i) for i in range(n) if self._a[i] > 0)
+
+    def close(self):
+        for name, typecode, length in _layout(0, 0, 0, 0, 0):
+            getattr(self, '_' + name).release()
+        self.map.close()
+        self.file.close()
+
+    @staticmethod
+    def _string(offsets, blob, i):
+        return bytes(blob[offsets[i]:offsets[i + 1]]).decode('utf-8')
+
+    def _name(self, i):
+        return self._string(self._name_offsets, self._names, i)
+
+    def _number(self, id):
+        """
+        Binary search of a node among the sorted ids.
+        @return The number of the node, or -1.
+        """
+        if id in self._found:
+            return self._found[id]
+        key = id.encode('utf-8')
+        low = 0
+        high = self.number_of_nodes
+        while low < high:
+            middle = (low + high) // 2
+            if bytes(self._names[self._name_offsets[middle]:self._name_offsets[middle + 1]]) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.number_of_nodes and self._name(low) == id:
+            self._found[id] = low
+            return low
+        return -1
+
+    def _data(self, i):
+        return {'a': self._a[i], 'ic': self._ic[i]}
+
+    def _edge(self, k):
+        w = self._out_w[k]
+        return {'w': int(w) if w.is_integer() else w,
+                'r': self._relation_names[self._out_r[k]]}
+
+    def _read_only_data(self, i):
+        return MappingProxyType(self._data(i))
+
+    def __getitem__(self, id):
+        i = self._number(id)
+        if i < 0:
+            return None
+        return self._read_only_data(i)
+
+    def _existing(self, id):
+        i = self._number(id)
+        if i < 0:
+            raise KeyError(id)
+        return i
+
+    def get_node(self, id):
+        return self._read_only_data(self._existing(id))
+
+    def __contains__(self, id):
+        return self._number(id) >= 0
+
+    def __iter__(self):
+        for i in range(self.number_of_nodes):
+            yield self._name(i)
+
+    def has_node(self, id):
+        return self._number(id) >= 0
+
+    def has_edge(self, fromId, toId, key=None):
+        i = self._number(fromId)
+        j = self._number(toId)
+        if i < 0 or j < 0:
+            return False
+        for k in range(self._out_ptr[i], self._out_ptr[i + 1]):
+            if self._out_dst[k] == j and (key is None or self._out_key[k] == key):
+                return True
+        return False
+
+    def out_arcs(self, id):
+        i = self._existing(id)
+        for k in range(self._out_ptr[i], self._out_ptr[i + 1]):
+            yield (id, self._name(self._out_dst[k]), self._out_key[k], self._edge(k))
+
+    def in_arcs(self, id):
+        j = self._existing(id)
+        for k in range(self._in_ptr[j], self._in_ptr[j + 1]):
+            edge = self._in_edge[k]
+            yield (self._name(self._in_src[k]), id, self._out_key[edge], self._edge(edge))
+
+    def in_degree(self, id):
+        j = self._existing(id)
+        return self._in_ptr[j + 1] - self._in_ptr[j]
+
+    def normaliser(self, id):
+        """
+        Same as ConceptNetwork.normaliser.
+        """
+        return 100 * divlog(self.in_degree(id))
+
+    def predecessors(self, id):
+        return iter(dict.fromkeys(arc[0] for arc in self.in_arcs(id)))
+
+    def successors(self, id):
+        return iter(dict.fromkeys(arc[1] for arc in self.out_arcs(id)))
+
+    def nodes(self, data=True):
+        if data:
+            return [(self._name(i), self._data(i)) for i in range(self.number_of_nodes)]
+        return list(self)
+
+    def edges(self, data=True):
+        result = []
+        for i in range(self.number_of_nodes):
+            n = self._name(i)
+            for k in range(self._out_ptr[i], self._out_ptr[i + 1]):
+                if data:
+                    result.append((n, self._name(self._out_dst[k]), self._edge(k)))
+                else:
+                    result.append((n, self._name(self._out_dst[k])))
+        return result
+
+    def session(self):
+        """
+        @return An activation session over this network.
+        @see session.py
+        """
+        from abstracter.concepts_network.session import ActivationSession
+        return ActivationSession(self)
+
+    def to_concept_network(self, cn=None):
+        """
+        Copies the snapshot into a modifiable network.
+
+        @param cn An empty ConceptNetwork (or CompactConceptNetwork),
+        created if None.
+        @return The ConceptNetwork.
+        """
+        if cn is None:
+            cn = ConceptNetwork()
+        cn.add_nodes_from(self.nodes())
+        for i in range(self.number_of_nodes):
+            n = self._name(i)
+            for k in range(self._out_ptr[i], self._out_ptr[i + 1]):
+                cn.add_edge(n, self._name(self._out_dst[k]), key=self._out_key[k], **self._edge(k))
+        return cn
+
+
+if __name__ == "__main__":
+    for arg in sys.argv[1:]:
+        print("Snapshot written : " + convert_directory(arg))
@@ -10,8 +10,9 @@ are other nouns, adjectives, verbs in normal form.
 to perform those operations.
 """
 
-from abstracter.parsers.retriever import retrieve_words_names
-from abstracter.parsers.tokenizer import refactor_crawler
+from abstracter.parsers.retriever import retrieve_words_names, retrieve_words_names_texts
+from abstracter.parsers.tokenizer import refactor_crawler, load_tagger
+from abstracter.parsers.normalizer import STEM_CACHE
 from abstracter.util.json_stream import JSONStreamWriter, read_json_stream
 from abstracter.util.http import make_http_request
 import json
@@ -21,6 +22,8 @@ import shutil
 from re import match
 from glob import glob
 import datetime as dt
+import itertools
+from multiprocessing import Pool
 
 #######################################
 # Directory where we put the raw crawler data.
@@ -62,6 +65,23 @@ CRAWLER_URL = 'http://nadrieril.fr/dropbox/crawlerpsc/'
 
 DEFAULT_LOCATION = "srv/ftp/crawlerpsc/"
 
+#################################
+# Number of processes parsing articles
+# (0 : articles are parsed in this process),
+# and number of articles parsed (and tagged) at once.
+#####################################
+
+PARSING_PROCESSES = 0
+
+PARSING_CHUNK_SIZE = 8
+
+#################################
+# File of the cache of stems (see parsers.normalizer.StemCache),
+# loaded before parsing (None : no file).
+#####################################
+
+STEM_CACHE_FILE = None
+
 
 def download_crawler_data(date):
     """
@@ -108,11 +128,87 @@ def parse_article(filename):
     return []
 
 
+def parse_articles(filenames):
+    """
+    Same as parse_article for several articles, whose sentences
+    are tagged at once.
+
+    @param filenames Names of the files to parse.
+    @return A list of tuples of two lists : [words,names].
+    @see parsers.retriever.retrieve_words_names_texts
+    """
+    texts = []
+    for filename in filenames:
+        with open(filename, 'r') as file:
+            texts.append(file.read())
+    return retrieve_words_names_texts(texts)
+
+
+def _article_numbers(max_subdirectories, max_files, data_directory, subdirectory):
+    """
+    @return A generator of the numbers [i, j] of the articles i/j of a
+    directory, in the order they are parsed.
+    """
+    i = 0
+    j = 0
+    while(os.path.exists(data_directory + "%s/%i/%i" % (subdirectory, i, j)) and i < max_subdirectories):
+        while(os.path.exists(data_directory + "%s/%i/%i" % (subdirectory, i, j)) and j < max_files):
+            yield [i, j]
+            j += 1
+        j = 0
+        i += 1
+
+
+def _init_parsing_process(stem_cache=None, pool=False):
+    """
+    Loads the POS tagger once in each process of the pool,
+    and the cache of stems.
+
+    @param pool If True (process of a pool), new stems are recorded,
+    to be sent back with the results (see _parse_chunk).
+    """
+    load_tagger()
+    if stem_cache:
+        STEM_CACHE.load(stem_cache)
+        if pool:
+            STEM_CACHE.record_new()
+
+
+def _parse_numbered_articles(articles):
+    """
+    @param articles List of [i, j, filename].
+    @return List of [i, j, result of parse_article].
+    """
+    results = parse_articles([article[2] for article in articles])
+    return [article[:2] + [result] for article, result in zip(articles, results)]
+
+
+def _parse_chunk(articles):
+    """
+    Parses articles in a process of the pool.
+
+    @return [result of _parse_numbered_articles, new stems of STEM_CACHE
+    (StemCache.new_stems), to be merged in the cache of the main process].
+    """
+    return [_parse_numbered_articles(articles), STEM_CACHE.new_stems()]
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    chunk = list(itertools.islice(iterator, size))
+    while chunk:
+        yield chunk
+        chunk = list(itertools.islice(iterator, size))
+
+
 def _parse_directory(max_subdirectories=10,
                      max_files=1000,
                      data_directory=DEFAULT_DATA_DIRECTORY,
                      results_directory=DEFAULT_RESULTS_DIRECTORY,
-                     subdirectory="2014_12_04"):
+                     subdirectory="2014_12_04",
+                     processes=PARSING_PROCESSES,
+                     ordered=True,
+                     stem_cache=STEM_CACHE_FILE):
     """
     Parse a directory from the crawler.
 
@@ -120,23 +216,46 @@ def _parse_directory(max_subdirectories=10,
     @param max_files Maximum number of files to analyze in a subdirectory.
     @param subdirectory The subdirectory to consider 
     (formatted date AAAA_MM_JJ).
+    @param processes Number of processes parsing the articles
+    (0 : articles are parsed one by one in this process).
+    @param ordered If False, the results of a pool of processes are written
+    as soon as they arrive, instead of in the order of the articles
+    (the written files are the same).
+    @param stem_cache File of the cache of stems, loaded before parsing
+    (by each process of the pool), and written after parsing, with the new
+    stems found by all the processes (None : no file).
     """
     if not os.path.isdir(results_directory + subdirectory + "/"):
         os.makedirs(results_directory + subdirectory + "/")
-    i = 0
-    j = 0
-    while(os.path.exists(data_directory + "%s/%i/%i" % (subdirectory, i, j)) and i < max_subdirectories):
-        while(os.path.exists(data_directory + "%s/%i/%i" % (subdirectory, i, j)) and j < max_files):
-            temp = parse_article(data_directory + "%s/%i/%i" % (subdirectory, i, j))
-            if temp:
-                with open(results_directory + "%s/%i_%i_concepts.json" % (subdirectory, i, j), 'w') as file:
-                    json.dump(temp[0], file)
-                with open(results_directory + "%s/%i_%i_names.json" % (subdirectory, i, j),'w') as file:
-                    json.dump(temp[1], file)
-                    print("successful with : " + data_directory + "%s/%i/%i" % (subdirectory, i, j))
-            j += 1
-        j = 0
-        i += 1
+    articles = ([i, j, data_directory + "%s/%i/%i" % (subdirectory, i, j)]
+                for i, j in _article_numbers(max_subdirectories, max_files,
+                                             data_directory, subdirectory))
+    chunks = _chunks(articles, PARSING_CHUNK_SIZE)
+    if processes > 0:
+        with Pool(processes, initializer=_init_parsing_process, initargs=(stem_cache, True)) as pool:
+            if stem_cache:
+                STEM_CACHE.load(stem_cache)
+            parse = pool.imap if ordered else pool.imap_unordered
+            for results, stems in parse(_parse_chunk, chunks):
+                STEM_CACHE.update(stems)
+                for i, j, temp in results:
+                    _write_article_results(i, j, temp, data_directory, results_directory, subdirectory)
+    else:
+        _init_parsing_process(stem_cache)
+        for chunk in chunks:
+            for i, j, temp in _parse_numbered_articles(chunk):
+                _write_article_results(i, j, temp, data_directory, results_directory, subdirectory)
+    if stem_cache:
+        STEM_CACHE.save(stem_cache)
+
+
+def _write_article_results(i, j, temp, data_directory, results_directory, subdirectory):
+    if temp:
+        with open(results_directory + "%s/%i_%i_concepts.json" % (subdirectory, i, j), 'w') as file:
+            json.dump(temp[0], file)
+        with open(results_directory + "%s/%i_%i_names.json" % (subdirectory, i, j),'w') as file:
+            json.dump(temp[1], file)
+            print("successful with : " + data_directory + "%s/%i/%i" % (subdirectory, i, j))
 
 
 def unify_day(directory=DEFAULT_RESULTS_DIRECTORY,
@@ -222,13 +341,15 @@ def unify(directory=CONCEPTS_NAMES_DATA_DIRECTORY, max_files=1000,
     writer.close()
 
 
-def download_and_parse_data(date="2015_01_05"):
+def download_and_parse_data(date="2015_01_05", processes=PARSING_PROCESSES):
     """
     Download data for a day, parse it, unify the dicts of names and concepts
     and write them in the default directory.
+
+    @param processes Number of processes parsing the articles (see _parse_directory).
     """
     download_crawler_data(date)
-    _parse_directory(max_subdirectories=10, max_files=1000, subdirectory=date)
+    _parse_directory(max_subdirectories=10, max_files=1000, subdirectory=date, processes=processes)
     unify_day(subdirectory=date)
 
 
@@ -274,14 +395,16 @@ def parse_for_systran(date="2015_01_05"):
     _parse_for_systran_directory(subdirectory=date)
 
 
-def update():
+def update(processes=PARSING_PROCESSES):
     """
     Update all crawler data, create up-to-date
     concepts and names dicts.
 
+    @param processes Number of processes parsing the articles
+    (for example os.cpu_count() ; see _parse_directory).
     @warning This operation make take a lot of
     time (1-2 hour) if there is much data to download
-    and to parse.
+    and to parse, unless articles are parsed by several processes.
     """
     start_date = dt.datetime(2015, 1, 1)
     end_date = (dt.datetime.now() - dt.timedelta(days=1))# .__str__().replace("-","_")
@@ -290,7 +413,7 @@ def update():
         current_date = (start_date + dt.timedelta(days=day_number)).date().__str__().replace("-","_")
         if not os.path.isdir(DEFAULT_DATA_DIRECTORY + current_date):
             print("updating : " + current_date)
-            download_and_parse_data(current_date)
+            download_and_parse_data(current_date, processes=processes)
     unify(names_file=BIG_FILES_DIRECTORY + "names_" + end_date.date().__str__().replace("-", "_") + ".jsons",
           concepts_file=BIG_FILES_DIRECTORY + "concepts_" + end_date.date().__str__().replace("-","_") + ".jsons")
 
@@ -3,12 +3,31 @@ Contains the code of a normalizer using wordnet and nltk.
 Most of it comes from conceptnet5.
 
 @see https://github.com/commonsense/conceptnet5/blob/1e86e2426af3ce4bea3b1d15dc02ebdfe9107544/conceptnet5/language/english.py
+
+Stems are kept in a cache (STEM_CACHE), by word and coarse part
+of speech : news articles use the same words again and again, and
+Morphy is slow. The cache can be saved, and loaded before parsing :
+@code
+STEM_CACHE.load("stems.jsons")
+...
+STEM_CACHE.save("stems.jsons")
+print(STEM_CACHE.stats())
+@endcode
 """
 
 from nltk.corpus import wordnet
+from abstracter.util.json_stream import JSONStreamWriter, read_json_stream
+from collections import OrderedDict
+import os
 
 morphy = wordnet._morphy
 
+###########################
+# Maximum number of stems kept in the cache.
+############################
+
+STEM_CACHE_SIZE = 200000
+
 STOPWORDS = ['the', 'a', 'an']
 
 EXCEPTIONS = {
@@ -115,6 +134,100 @@ def _morphy_best(word, pos=None):
     return results[0]
 
 
+class StemCache:
+    """
+    @class StemCache
+    @brief Least recently used stems of morphy_stem,
+    by (lower case word, coarse part of speech).
+    """
+
+    def __init__(self, max_size=STEM_CACHE_SIZE):
+        self.max_size = max_size
+        self.stems = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        # stems put since the last new_stems call (None : not recorded)
+        self.new = None
+
+    def get(self, key):
+        """
+        @return The stem cached for key, or None.
+        """
+        stem = self.stems.get(key)
+        if stem is None:
+            self.misses += 1
+            return None
+        self.stems.move_to_end(key)
+        self.hits += 1
+        return stem
+
+    def put(self, key, stem):
+        self.stems[key] = stem
+        self.stems.move_to_end(key)
+        while len(self.stems) > self.max_size:
+            self.stems.popitem(last=False)
+        if self.new is not None:
+            self.new[key] = stem
+
+    def update(self, stems):
+        """
+        Puts stems given as [word, part of speech, stem].
+        """
+        for word, pos, stem in stems:
+            self.put((word, pos), stem)
+
+    def record_new(self):
+        """
+        Records the next stems put, for new_stems (for example, the stems
+        found by another process, to be merged with update).
+        """
+        self.new = dict()
+
+    def new_stems(self):
+        """
+        @return The stems put since record_new or the last call,
+        as [word, part of speech, stem] (an empty list if they are not recorded).
+        """
+        if not self.new:
+            return []
+        stems = [[key[0], key[1], stem] for key, stem in self.new.items()]
+        self.new = dict()
+        return stems
+
+    def clear(self):
+        self.stems.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        """
+        @return A dict : hits and misses since the cache was created
+        (or cleared), number of stems and maximum number of stems.
+        """
+        return {'hits': self.hits, 'misses': self.misses,
+                'size': len(self.stems), 'max_size': self.max_size}
+
+    def save(self, filename):
+        """
+        Writes the stems (least recently used first) as a JSON stream
+        of [word, part of speech, stem].
+        """
+        writer = JSONStreamWriter(filename)
+        for key, stem in self.stems.items():
+            writer.write([key[0], key[1], stem])
+        writer.close()
+
+    def load(self, filename):
+        """
+        Adds the stems of a file written by save, if it exists.
+        """
+        if os.path.isfile(filename):
+            self.update(read_json_stream(filename))
+
+
+STEM_CACHE = StemCache()
+
+
 def morphy_stem(word, pos=None):
     """
     @brief Get the most likely stem for a word.
@@ -127,9 +240,24 @@ def morphy_stem(word, pos=None):
     * 'a' or 'JJ' for adjectives
     * 'r' or 'RB' for adverbs
     Any other part of speech will be treated as unknown.
+
+    Stems are cached in STEM_CACHE.
     """
     # FIXME: strip punctuation that may still be attached to the word
     word = word.lower()
+    pos = _coarse_pos(word, pos)
+    key = (word, pos)
+    stem = STEM_CACHE.get(key)
+    if stem is None:
+        stem = _morphy_stem(word, pos)
+        STEM_CACHE.put(key, stem)
+    return stem
+
+
+def _coarse_pos(word, pos):
+    """
+    @return The part of speech given to Morphy ('n', 'v', 'a', 'r'), None if unknown.
+    """
     if pos is not None:
         if pos.startswith('NN'):
             pos = 'n'
@@ -143,6 +271,10 @@ def morphy_stem(word, pos=None):
         pos = 'v'
     if pos is not None and pos not in 'nvar':
         pos = None
+    return pos
+
+
+def _morphy_stem(word, pos):
     if word in EXCEPTIONS:
         return EXCEPTIONS[word]
     if pos is None:
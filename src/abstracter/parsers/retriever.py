@@ -12,6 +12,7 @@ in the text, no syntax parsing is required for this task).
 
 import abstracter.parsers.normalizer as norm
 import abstracter.parsers.tokenizer as tok
+import bisect
 import re
 
 ###################################
@@ -89,6 +90,7 @@ def _links_to(entity_list, name):
     @param entity_list List of entities (string).
     @param name A name (string).
     @return A full name (string).
+    @see _linking_index, to link all the names of a list.
     """
     if entity_list:
         temp = name
@@ -99,6 +101,41 @@ def _links_to(entity_list, name):
     return None
 
 
+def _linking_index(names):
+    """
+    @brief _links_to(names, name) for all the names at once.
+
+    _links_to scans the list : each time the current name is in an
+    entity, the entity becomes the current name. Thus, for each name,
+    we need the next entity (in the list) containing it.
+    Names contained in each distinct entity are found by looking up its
+    substrings (of the lengths of the names) ; then, the full name reached
+    from each position of the list is computed from the end of the list.
+
+    @param names List of names (string), the entity list of _links_to.
+    @return A dict : name -> _links_to(names, name).
+    """
+    distinct = set(names)
+    lengths = sorted(set(len(n) for n in distinct))
+    # name : positions of the entities containing it
+    positions = dict((n, []) for n in distinct)
+    contained = dict()
+    for index, e in enumerate(names):
+        if e not in contained:
+            contained[e] = set(e[i:i + length] for length in lengths if length <= len(e)
+                               for i in range(len(e) - length + 1)
+                               if e[i:i + length] in distinct)
+        for n in contained[e]:
+            positions[n].append(index)
+    # full name reached from each position, when the current name is the entity there
+    reached = [None] * len(names)
+    for index in range(len(names) - 1, -1, -1):
+        after = positions[names[index]]
+        k = bisect.bisect_right(after, index)
+        reached[index] = reached[after[k]] if k < len(after) else names[index]
+    return dict((n, reached[positions[n][0]]) for n in distinct)
+
+
 def get_names(sents):
     """
     @brief Get all named entities in previously tagged sentences.
@@ -175,9 +212,10 @@ def retrieve_names_only(sents):
     @return List of names (string).
     """
     names = list(s.lower() for s in get_names(sents))
+    links = _linking_index(names)
     res = {}
     for name in names:
-        name2 = _links_to(names, name)
+        name2 = links[name]
         if name2 not in res:
             res[name2] = 1
         else:
@@ -195,3 +233,15 @@ def retrieve_words_names(text):
     """
     sents = list(tok.tokenize_and_tag(text))
     return [retrieve_words_only(sents), retrieve_names_only(sents)]
+
+
+def retrieve_words_names_texts(texts):
+    """
+    Same as retrieve_words_names, for several texts :
+    the sentences of all the texts are tagged at once.
+
+    @param texts Iterable of texts (string).
+    @return A list containing a tuple [words,names] for each text.
+    """
+    return [[retrieve_words_only(sents), retrieve_names_only(sents)]
+            for sents in tok.tokenize_and_tag_texts(texts)]
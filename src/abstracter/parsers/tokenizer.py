@@ -7,7 +7,9 @@ Those tokenizers may adapt to the errors we find n our data
 Thus, some of them may be unuseful, even bad, for other sets of data.
 """
 
-from nltk import word_tokenize, pos_tag
+from nltk import word_tokenize
+import re
+import sys
 
 ####################
 # Punctuation
@@ -33,6 +35,40 @@ BOUNDARIES = ["!", ".", "?", "\n", "'"]
 
 CRAWLER_BOUNDARIES = ["!", ".", "?", "\n", ":"]
 
+# POS tagger of the process (see load_tagger).
+_TAGGER = [None]
+
+
+def load_tagger():
+    """
+    @brief The POS tagger used by nltk.pos_tag, loaded once in each process.
+
+    Depending on its version, nltk.pos_tag may load its model at each
+    call : we keep the tagger, and call its tag method.
+
+    @return The tagger (an nltk.tag.api.TaggerI).
+    """
+    if _TAGGER[0] is None:
+        try:
+            # nltk 3.0 : pickled maxent tagger
+            from nltk.tag import _POS_TAGGER
+            from nltk.data import load
+            _TAGGER[0] = load(_POS_TAGGER)
+        except ImportError:
+            from nltk.tag.perceptron import PerceptronTagger
+            _TAGGER[0] = PerceptronTagger()
+    return _TAGGER[0]
+
+
+def tag_sents(sentences):
+    """
+    @brief Tags several sentences at once (same tags as nltk.pos_tag on each of them).
+
+    @param sentences List of lists of words.
+    @return A list of lists of (word, POS).
+    """
+    return load_tagger().tag_sents(sentences)
+
 
 def tokenize(text):
     """
@@ -53,6 +89,47 @@ def _refactor(text):
     return res
 
 
+#########################
+# Names shortenings, which are not the end of a sentence
+# when followed by an upper case letter (as in "McDonald").
+##########################
+
+CRAWLER_SHORTENINGS = ["Mc", "M", "Mr", "Ms", "Mrs"]
+
+# Scanner of refactor_crawler (see _crawler_scanner).
+_SCANNER = [None]
+
+# Adds a space after each character of PUNKT2.
+_PUNKT2_SPACES = str.maketrans(dict((p, p + " ") for p in PUNKT2))
+
+
+def _crawler_scanner():
+    """
+    Finding where refactor_crawler may cut a text : before an upper case
+    letter following a lower case one, a space following a space,
+    or on a character of CRAWLER_BOUNDARIES.
+
+    The text is translated first, lower case letters to 'l' and upper
+    case ones to 'U' : a regular expression with few characters then
+    finds the cuts much faster than with classes of all the letters.
+    The table is built once, at the first call.
+
+    @return The translation table, and the regular expression to use on
+    the translated text : it matches the character before the cut ('l' or ' '),
+    or the boundary.
+    """
+    if _SCANNER[0] is None:
+        table = dict()
+        for code in range(sys.maxunicode + 1):
+            if chr(code).islower():
+                table[code] = 'l'
+            elif chr(code).isupper():
+                table[code] = 'U'
+        _SCANNER[0] = [table, re.compile('l(?=U)| (?= )|[%s]' % (
+            ''.join(re.escape(c) for c in CRAWLER_BOUNDARIES)))]
+    return _SCANNER[0]
+
+
 def refactor_crawler(text):
     """
     @brief Refactor crawler data.
@@ -68,37 +145,41 @@ def refactor_crawler(text):
     This function intends to make the data useful, for some natural language
     tools (for example Systran's tools).
 
+    The text is read once : a regular expression finds the places where
+    sentences may be cut, and sentences are slices of the text.
+    Text after the last cut is dropped.
+
     @param text Raw text data (str or any character iterable).
     @return A list of sentences (str).
     """
-    temp = []
+    # a space before the text : a space at the beginning is a cut
+    text = ' ' + _refactor(text)
+    table, scanner = _crawler_scanner()
     sents = []
-    car2 = ' '
-    for car in _refactor(text):
-        if (car.isupper() and car2.islower()):
-            l = (''.join(temp)).split(' ')
-            if l[len(l) - 1] not in ["Mc", "M", "Mr", "Ms", "Mrs"]:
-                sents.append(''.join(temp))
-                temp = []
-            temp.append(car)
-        elif (car == ' ' and car2 == ' '):
-            sents.append(''.join(temp))
-            temp = []
-        elif car not in CRAWLER_BOUNDARIES:
-            temp.append(car)
+    start = 1
+    for match in scanner.finditer(text.translate(table)):
+        i = match.start()
+        if match.group() == 'l':
+            # cut before the upper case letter, unless the word is a shortening
+            i += 1
+            if text[max(start, text.rfind(' ', start, i) + 1):i] not in CRAWLER_SHORTENINGS:
+                sents.append(text[start:i])
+                start = i
         else:
-            sents.append(''.join(temp))
-            temp = []
-        car2 = car
+            # two spaces : cut on the second one
+            if match.group() == ' ':
+                i += 1
+            sents.append(text[start:i])
+            start = i + 1
     for sent in sents:
-        for p in PUNKT2:
-            sent = sent.replace(p, p + " ")
-        while sent and not sent[0].isalpha():
-            sent = sent[1:]
-        if sent and sent[len(sent) - 1].isalpha():
+        sent = sent.translate(_PUNKT2_SPACES)
+        first = 0
+        while first < len(sent) and not sent[first].isalpha():
+            first += 1
+        sent = sent[first:]
+        if sent and sent[-1].isalpha():
             sent = sent + '.'
-        sent2 = sent.replace(" ", "")
-        if sent2 != "":
+        if sent:
             yield sent
 
 
@@ -111,17 +192,36 @@ def tokenize_and_tag(text):
 
     @see PUNKT
 
+    All the sentences of the text are tagged at once.
+
     @param text Raw text data (str).
     @return Yields a list of lists of [word,POS].
     """
-    for sent in refactor_crawler(text):
-        sent2 = sent
-        # for i in MAJ:
-        #    sent2 = sent2.replace(i, " " + i)
-        for i in PUNKT:
-            sent2 = sent2.replace(i, " ")
-        split = word_tokenize(sent2)
-        yield (pos_tag(split))
+    for sent in tag_sents([_split_crawler_sentence(sent) for sent in refactor_crawler(text)]):
+        yield sent
+
+
+def tokenize_and_tag_texts(texts):
+    """
+    Same as tokenize_and_tag, for several texts (for example a chunk
+    of articles) : all their sentences are tagged at once.
+
+    @param texts Iterable of raw texts (str).
+    @return A list containing, for each text, its list of tagged sentences.
+    """
+    splits = [[_split_crawler_sentence(sent) for sent in refactor_crawler(text)]
+              for text in texts]
+    tagged = iter(tag_sents([split for text in splits for split in text]))
+    return [[next(tagged) for split in text] for text in splits]
+
+
+def _split_crawler_sentence(sent):
+    sent2 = sent
+    # for i in MAJ:
+    #    sent2 = sent2.replace(i, " " + i)
+    for i in PUNKT:
+        sent2 = sent2.replace(i, " ")
+    return word_tokenize(sent2)
 
 
 def custom_sent_tokenize(text):
@@ -154,9 +254,7 @@ def custom_word_tokenize(text):
     and keeps the order of the words.
     """
     words = []
-    for sent in custom_sent_tokenize(text):
-        split = word_tokenize(sent)
-        tokens = pos_tag(split)
+    for tokens in tag_sents([word_tokenize(sent) for sent in custom_sent_tokenize(text)]):
         temp = []
         for key, val in tokens:
             if val == 'NNP':
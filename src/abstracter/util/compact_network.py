@@ -0,0 +1,643 @@
+"""@file compact_network.py
+@brief A network stored in typed arrays.
+
+Network wraps a networkx.MultiDiGraph, which costs several python
+dicts for each node and each edge : a network of the size of rc5
+(or bigger) takes a lot of memory and is slow to load.
+
+CompactNetwork has the same public methods as Network, but :
+* node ids are interned as integers (index of the node),
+* attributes 'a', 'ic' (nodes) and 'w' (edges) are stored in
+typed arrays,
+* relations 'r' are stored as numbers, in a table of relations
+which starts with RELATIONS,
+* the edges of a node are arrays of edge numbers, and edges are
+found by (start, end) in a dict, thus adding and finding an edge
+take a constant time, whatever the degree of the nodes.
+Other attributes (for example 'syntagm' in a Workspace),
+or values which do not fit in the arrays (floats, None...),
+are kept in dicts, so that no information is lost.
+
+@code
+n = CompactNetwork()
+n.add_node(id="toto", a=70, ic=5)
+n.add_node(id="babar", a=0, ic=6)
+n.add_edge(fromId="toto", toId="babar", r="IsA", w=50)
+print(n["toto"])
+print(n.get_edge("toto", "babar", 0))
+for v in n.out_arcs("toto"):
+    print(v)
+@endcode
+
+Reading n[id] gives a view of the node's attributes, which can be
+read and written like the dict given by Network.
+However, nodes() and edges() give copies of the attributes.
+
+@warning Removed nodes and edges leave unused slots in the arrays
+(the arrays of edges of a node are compacted when half of them
+are removed edges).
+"""
+
+from abstracter.util.network import Network
+from networkx.readwrite import json_graph
+from collections.abc import MutableMapping
+from array import array
+import networkx as nx
+import heapq
+import json
+
+#################################
+# Relations known from the start (ConceptNet5 relations
+# we keep, and relations we create).
+# Other relations are added to the table when they appear.
+##################################
+
+RELATIONS = ['IsA', 'CapableOf', 'AtLocation', 'Antonym',
+             'HasProperty', 'HasA', 'UsedFor', 'SimilarTo']
+
+# (start, end) of an edge, as one integer (node numbers fit in 31 bits).
+_PAIR_SHIFT = 31
+
+
+class _Column:
+    """
+    Values of one attribute, for all nodes (or all edges).
+    Integers are stored in an array of 32 bits integers,
+    other values in a dict.
+    """
+    ABSENT = -2 ** 31
+
+    def __init__(self):
+        self.values = array('i')
+        self.others = dict()
+
+    def append(self):
+        self.values.append(self.ABSENT)
+
+    def has(self, i):
+        return self.values[i] != self.ABSENT or i in self.others
+
+    def get(self, i):
+        v = self.values[i]
+        if v != self.ABSENT:
+            return v
+        return self.others[i]
+
+    def set(self, i, value):
+        if type(value) is int and self.ABSENT < value < 2 ** 31:
+            self.values[i] = value
+            self.others.pop(i, None)
+        else:
+            self.values[i] = self.ABSENT
+            self.others[i] = value
+
+    def delete(self, i):
+        self.values[i] = self.ABSENT
+        self.others.pop(i, None)
+
+
+class _EnumColumn(_Column):
+    """
+    Values of one attribute taken in a small table (relations) :
+    each value is stored as its number in the table.
+    """
+    ABSENT = 2 ** 16 - 1
+
+    def __init__(self, table):
+        self.values = array('H')
+        self.others = dict()
+        self.table = list(table)
+        self.numbers = dict((v, k) for k, v in enumerate(self.table))
+
+    def get(self, i):
+        v = self.values[i]
+        if v != self.ABSENT:
+            return self.table[v]
+        return self.others[i]
+
+    def set(self, i, value):
+        if type(value) is str:
+            if value not in self.numbers and len(self.table) < self.ABSENT:
+                self.numbers[value] = len(self.table)
+                self.table.append(value)
+            if value in self.numbers:
+                self.values[i] = self.numbers[value]
+                self.others.pop(i, None)
+                return
+        self.values[i] = self.ABSENT
+        self.others[i] = value
+
+
+class _AttributesView(MutableMapping):
+    """
+    Attributes of a node or an edge of a CompactNetwork,
+    seen as a dict.
+    """
+    __slots__ = ['columns', 'extras', 'i', 'written']
+
+    def __init__(self, columns, extras, i, written=None):
+        self.columns = columns
+        self.extras = extras
+        self.i = i
+        self.written = written
+
+    def __getitem__(self, key):
+        if key in self.columns:
+            return self.columns[key].get(self.i)
+        return self.extras[self.i][key]
+
+    def __setitem__(self, key, value):
+        if key in self.columns:
+            self.columns[key].set(self.i, value)
+        else:
+            if self.i not in self.extras:
+                self.extras[self.i] = dict()
+            self.extras[self.i][key] = value
+        if self.written:
+            self.written(self.i, key, value)
+
+    def __delitem__(self, key):
+        if key in self.columns:
+            if not self.columns[key].has(self.i):
+                raise KeyError(key)
+            self.columns[key].delete(self.i)
+        else:
+            del self.extras[self.i][key]
+
+    def __iter__(self):
+        for key, column in self.columns.items():
+            if column.has(self.i):
+                yield key
+        if self.i in self.extras:
+            for key in self.extras[self.i]:
+                yield key
+
+    def __len__(self):
+        return len(list(self.__iter__()))
+
+    def __repr__(self):
+        return dict(self).__repr__()
+
+
+class CompactNetwork(Network):
+    """
+    @class CompactNetwork
+    Class representing a network, with the same methods as Network,
+    stored in arrays instead of networkx objects.
+    """
+
+    def __init__(self):
+        # node id of each node number (None if the node was removed)
+        self._ids = []
+        # node number of each node id
+        self._index = dict()
+        self._node_columns = {'a': _Column(), 'ic': _Column()}
+        self._node_extras = dict()
+        # edge number -> edge numbers going out of / coming in each node
+        self._out = []
+        self._in = []
+        # node number : number of removed edges still in its array of edges
+        self._out_removed = dict()
+        self._in_removed = dict()
+        # (start, end) pair : its edge number, or list of edge numbers
+        self._pairs = dict()
+        # start and end of each edge (-1 if the edge was removed)
+        self._src = array('i')
+        self._dst = array('i')
+        self._keys = _Column()
+        self._edge_columns = {'w': _Column(), 'r': _EnumColumn(RELATIONS)}
+        self._edge_extras = dict()
+
+    def node_attribute_written(self, id, key, value):
+        """
+        Called each time an attribute of a node is written
+        (nothing is done here, subclasses may use it).
+        """
+        pass
+
+    def _written(self, i, key, value):
+        self.node_attribute_written(self._ids[i], key, value)
+
+    def _node_view(self, i):
+        return _AttributesView(self._node_columns, self._node_extras, i, self._written)
+
+    def _edge_view(self, e):
+        return _AttributesView(self._edge_columns, self._edge_extras, e)
+
+    def _number(self, id):
+        """
+        @return The number of a node, created if necessary.
+        """
+        if id in self._index:
+            return self._index[id]
+        i = len(self._ids)
+        self._ids.append(id)
+        self._index[id] = i
+        for column in self._node_columns.values():
+            column.append()
+        self._out.append(array('i'))
+        self._in.append(array('i'))
+        return i
+
+    def _pair_edges(self, i, j):
+        """
+        @return The numbers of the edges i -> j, oldest first.
+        """
+        edges = self._pairs.get((i << _PAIR_SHIFT) | j)
+        if edges is None:
+            return ()
+        if type(edges) is int:
+            return (edges,)
+        return edges
+
+    def _add_pair_edge(self, i, j, e):
+        pair = (i << _PAIR_SHIFT) | j
+        edges = self._pairs.get(pair)
+        if edges is None:
+            self._pairs[pair] = e
+        elif type(edges) is int:
+            self._pairs[pair] = [edges, e]
+        else:
+            edges.append(e)
+
+    def _remove_pair_edge(self, i, j, e):
+        pair = (i << _PAIR_SHIFT) | j
+        edges = self._pairs[pair]
+        if type(edges) is int:
+            del self._pairs[pair]
+        else:
+            edges.remove(e)
+            if len(edges) == 1:
+                self._pairs[pair] = edges[0]
+
+    def _out_edges(self, i):
+        """
+        @return The numbers of the edges going out of node i.
+        """
+        if i in self._out_removed:
+            return [e for e in self._out[i] if self._src[e] >= 0]
+        return self._out[i]
+
+    def _in_edges(self, i):
+        """
+        @return The numbers of the edges coming in node i.
+        """
+        if i in self._in_removed:
+            return [e for e in self._in[i] if self._src[e] >= 0]
+        return self._in[i]
+
+    def _find_edge(self, i, j, key=None):
+        """
+        @return The number of an edge i -> j (with key if not None), or -1.
+        """
+        for e in self._pair_edges(i, j):
+            if key is None or self._keys.get(e) == key:
+                return e
+        return -1
+
+    def _new_edge(self, i, j, key):
+        e = len(self._src)
+        self._src.append(i)
+        self._dst.append(j)
+        self._keys.append()
+        self._keys.set(e, key)
+        for column in self._edge_columns.values():
+            column.append()
+        self._out[i].append(e)
+        self._in[j].append(e)
+        self._add_pair_edge(i, j, e)
+        return e
+
+    def _free_key(self, i, j):
+        """
+        Same choice of a new key as networkx.
+        """
+        keys = set(self._keys.get(e) for e in self._pair_edges(i, j))
+        key = len(keys)
+        while key in keys:
+            key += 1
+        return key
+
+    def _remove_edge_number(self, e):
+        """
+        Removes an edge. It stays in the arrays of edges of its nodes
+        (skipped, since its start is -1) until they are compacted.
+        """
+        i = self._src[e]
+        j = self._dst[e]
+        self._remove_pair_edge(i, j, e)
+        self._src[e] = -1
+        self._dst[e] = -1
+        self._keys.delete(e)
+        for column in self._edge_columns.values():
+            column.delete(e)
+        self._edge_extras.pop(e, None)
+        self._edge_removed(self._out, self._out_removed, i)
+        self._edge_removed(self._in, self._in_removed, j)
+
+    def _edge_removed(self, arrays, removed, i):
+        """
+        Compacts the array of edges arrays[i] when half of it are removed edges.
+        """
+        removed[i] = removed.get(i, 0) + 1
+        if 2 * removed[i] >= len(arrays[i]):
+            arrays[i] = array('i', (e for e in arrays[i] if self._src[e] >= 0))
+            del removed[i]
+
+    def _arc(self, e):
+        return (self._ids[self._src[e]], self._ids[self._dst[e]],
+                self._keys.get(e), self._edge_view(e))
+
+    def _node_dict(self, i):
+        return dict(_AttributesView(self._node_columns, self._node_extras, i))
+
+    ###########################################################
+
+    def __getitem__(self, id):
+        if id in self._index:
+            return self._node_view(self._index[id])
+        return None
+
+    def __iter__(self):
+        return iter(list(self._index))
+
+    def __contains__(self, id):
+        return id in self._index
+
+    def nodes_iter(self):
+        for id, i in list(self._index.items()):
+            yield (id, self._node_view(i))
+
+    def get_node(self, id):
+        return self._node_view(self._index[id])
+
+    def set_node_data(self, id, data):
+        """
+        Replaces the attributes of an existing node.
+        """
+        view = self.get_node(id)
+        for key in list(view):
+            del view[key]
+        for key, value in data.items():
+            view[key] = value
+
+    def add_node(self, id, **kwargs):
+        CompactNetwork._add_node(self, id, kwargs)
+
+    def _add_node(self, id, data):
+        view = self._node_view(self._number(id))
+        for akey, avalue in data.items():
+            view[akey] = avalue
+
+    def add_edge(self, fromId, toId, key=0, **kwargs):
+        """
+        Add an edge with as many data as you want.
+        If the edge (with the same key) exists, its data is updated.
+        """
+        CompactNetwork._add_edge(self, fromId, toId, key, kwargs)
+
+    def _add_edge(self, fromId, toId, key, data):
+        i = self._number(fromId)
+        j = self._number(toId)
+        if key is None:
+            key = self._free_key(i, j)
+        e = self._find_edge(i, j, key)
+        if e < 0:
+            e = self._new_edge(i, j, key)
+        view = self._edge_view(e)
+        for akey, avalue in data.items():
+            view[akey] = avalue
+
+    def remove_node(self, id):
+        i = self._index.pop(id)
+        for e in list(self._out[i]) + list(self._in[i]):
+            if self._src[e] >= 0:
+                self._remove_edge_number(e)
+        self._out[i] = array('i')
+        self._in[i] = array('i')
+        self._out_removed.pop(i, None)
+        self._in_removed.pop(i, None)
+        self._ids[i] = None
+        for column in self._node_columns.values():
+            column.delete(i)
+        self._node_extras.pop(i, None)
+
+    def remove_edge(self, fromId, toId, key=None, all=True):
+        if not (self.has_node(fromId) and self.has_node(toId)):
+            return
+        i = self._index[fromId]
+        j = self._index[toId]
+        if all:
+            for e in list(self._pair_edges(i, j)):
+                self._remove_edge_number(e)
+        elif key is None:
+            # the last one, as networkx
+            edges = self._pair_edges(i, j)
+            if edges:
+                self._remove_edge_number(edges[-1])
+        else:
+            e = self._find_edge(i, j, key)
+            if e >= 0:
+                self._remove_edge_number(e)
+
+    def has_node(self, id):
+        return id in self._index
+
+    def has_edge(self, fromId, toId, key=None):
+        if not (self.has_node(fromId) and self.has_node(toId)):
+            return False
+        return self._find_edge(self._index[fromId], self._index[toId], key) >= 0
+
+    def predecessors(self, id):
+        return iter(dict.fromkeys(self._ids[self._src[e]] for e in self._in_edges(self._index[id])))
+
+    def successors(self, id):
+        return iter(dict.fromkeys(self._ids[self._dst[e]] for e in self._out_edges(self._index[id])))
+
+    def get_edge(self, fromId, toId, key=0):
+        e = self._find_edge(self._index[fromId], self._index[toId], key)
+        if e < 0:
+            raise KeyError(key)
+        return self._edge_view(e)
+
+    def out_arcs(self, id):
+        return (self._arc(e) for e in self._out_edges(self._index[id])[:])
+
+    def in_arcs(self, id):
+        return (self._arc(e) for e in self._in_edges(self._index[id])[:])
+
+    def in_degree(self, id):
+        i = self._index[id]
+        return len(self._in[i]) - self._in_removed.get(i, 0)
+
+    def nodes(self, data=True):
+        """
+        @return A list of nodes' ids, or of (id, copy of the attributes).
+        """
+        if data:
+            return [(id, self._node_dict(i)) for id, i in self._index.items()]
+        return list(self._index)
+
+    def edges(self, data=True):
+        """
+        @return A list of (from, to), or of (from, to, copy of the attributes).
+        """
+        result = []
+        for e in range(len(self._src)):
+            if self._src[e] >= 0:
+                if data:
+                    result.append((self._ids[self._src[e]], self._ids[self._dst[e]],
+                                   dict(self._edge_view(e))))
+                else:
+                    result.append((self._ids[self._src[e]], self._ids[self._dst[e]]))
+        return result
+
+    def shortest_path(self, source=None, target=None, weight=None):
+        """
+        Shortest path from source to target (breadth-first search,
+        or Dijkstra's algorithm if the name of the weight attribute is given).
+
+        @return A list of nodes' ids.
+        """
+        start = self._index[source]
+        end = self._index[target]
+        previous = {start: None}
+        if weight is None:
+            current = [start]
+            while current and end not in previous:
+                following = []
+                for i in current:
+                    for e in self._out_edges(i):
+                        j = self._dst[e]
+                        if j not in previous:
+                            previous[j] = i
+                            following.append(j)
+                current = following
+        else:
+            distances = {start: 0}
+            heap = [(0, start)]
+            done = set()
+            while heap:
+                d, i = heapq.heappop(heap)
+                if i in done:
+                    continue
+                done.add(i)
+                if i == end:
+                    break
+                for e in self._out_edges(i):
+                    j = self._dst[e]
+                    w = self._edge_view(e).get(weight, 1)
+                    if j not in distances or d + w < distances[j]:
+                        distances[j] = d + w
+                        previous[j] = i
+                        heapq.heappush(heap, (d + w, j))
+        if end not in previous:
+            raise nx.NetworkXNoPath("No path between %s and %s." % (source, target))
+        path = [end]
+        while previous[path[-1]] is not None:
+            path.append(previous[path[-1]])
+        return [self._ids[i] for i in reversed(path)]
+
+    def add_nodes_from(self, it):
+        """
+        @param it Iterable of nodes' ids or of [id, dict of attributes].
+        """
+        for n in it:
+            try:
+                hash(n)
+                id, data = n, {}
+            except TypeError:
+                id, data = n
+            self._add_node(id, data)
+
+    def add_edges_from(self, it):
+        """
+        @param it Iterable of [from, to], [from, to, dict of attributes]
+        or [from, to, key, dict of attributes].
+        """
+        for e in it:
+            if len(e) == 4:
+                fromId, toId, key, data = e
+            elif len(e) == 3:
+                fromId, toId, data = e
+                key = None
+            else:
+                fromId, toId = e
+                key, data = None, {}
+            self._add_edge(fromId, toId, key, data)
+
+    def number_of_nodes(self):
+        return len(self._index)
+
+    def neighbour_counts(self, id):
+        """
+        @return (number of predecessors, number of successors) of a node.
+        """
+        i = self._index[id]
+        return (len(set(self._src[e] for e in self._in_edges(i))),
+                len(set(self._dst[e] for e in self._out_edges(i))))
+
+    def remove_nodes_from(self, ids):
+        """
+        Removes nodes (and their edges) at once : the arrays of edges
+        of each neighbour are filtered once, whatever the number
+        of its removed edges.
+        """
+        removed = set(self._index.pop(id) for id in ids if id in self._index)
+        edges = set()
+        for i in removed:
+            edges.update(self._out_edges(i))
+            edges.update(self._in_edges(i))
+        touched = set()
+        for e in edges:
+            touched.add(self._src[e])
+            touched.add(self._dst[e])
+            self._remove_pair_edge(self._src[e], self._dst[e], e)
+        for e in edges:
+            self._src[e] = -1
+        for j in touched - removed:
+            self._out[j] = array('i', (e for e in self._out[j] if self._src[e] >= 0))
+            self._in[j] = array('i', (e for e in self._in[j] if self._src[e] >= 0))
+            self._out_removed.pop(j, None)
+            self._in_removed.pop(j, None)
+        for e in edges:
+            self._dst[e] = -1
+            self._keys.delete(e)
+            for column in self._edge_columns.values():
+                column.delete(e)
+            self._edge_extras.pop(e, None)
+        for i in removed:
+            self._out[i] = array('i')
+            self._in[i] = array('i')
+            self._out_removed.pop(i, None)
+            self._in_removed.pop(i, None)
+            self._ids[i] = None
+            for column in self._node_columns.values():
+                column.delete(i)
+            self._node_extras.pop(i, None)
+
+    ###########################################################
+    # networkx conversion, JSON and drawing
+    ##############################################
+
+    @property
+    def network(self):
+        """
+        A networkx.MultiDiGraph copy of the network, built on demand
+        (used for drawing and JSON).
+        """
+        graph = nx.MultiDiGraph()
+        for id, data in self.nodes():
+            graph.add_node(id, attr_dict=data)
+        for e in range(len(self._src)):
+            if self._src[e] >= 0:
+                n1, n2, key, data = self._arc(e)
+                graph.add_edge(n1, n2, key=key, attr_dict=dict(data))
+        return graph
+
+    def load_from_JSON(self, filename="temp.json"):
+        with open(filename, 'r') as file:
+            graph = json_graph.node_link_graph(json.load(file))
+        self.__init__()
+        self.add_nodes_from(graph.nodes(data=True))
+        self.add_edges_from(graph.edges(keys=True, data=True))
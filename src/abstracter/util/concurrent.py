@@ -1,44 +1,459 @@
 """@file concurrent.py
 @brief Making concurrent requests, using asyncio and aiohttp.
+
+Responses are kept in a persistent cache (see response_cache.py) :
+only urls which are not in the cache are fetched.
+
+Urls are compared by their canonical form (response_cache.canonical_url) :
+* a url asked several times in a call is requested once,
+* the last MEMORY_RESPONSES responses are kept in memory, and shared
+by all the calls of the process,
+* a url which is being requested by another thread is not requested
+again : we wait for its response.
+request_stats() tells how many requests were saved this way.
+These counters, the latency of the requests ('http.latency'), the time
+spent waiting for a free slot ('http.wait'), in the cache and parsing
+are also recorded in util.metrics.
+
+Requests are sent by a Fetcher :
+* all requests share one aiohttp.ClientSession (and its pool of connections),
+* at most max_concurrent requests are sent at a time,
+* requests to a same host are spaced out (per_second requests per second),
+* after a timeout or a server error (5xx, 429), a request is sent again,
+waiting longer and longer (exponential backoff) ; other failures
+(client errors, a response which is not JSON...) are not retried,
+* each request which finally fails gives a FetchFailure.
+
+Settings are in util.settings. requests can be called from several
+threads at once : each thread has its own connection to the cache, but
+they all share one Fetcher (get_fetcher), whose event loop runs in its own
+thread, thus the limits (max_concurrent, per_second) hold for the whole
+process. close_fetcher closes it (a new one is created when needed).
+
+A Fetcher can be tried against a local server,
+for example with "python3 -m http.server 8000" in a directory of .json files :
+@code
+fetcher = Fetcher(max_concurrent=4, per_second=100, retries=1, proxy=None)
+responses, failures = fetcher.run({"a": "http://localhost:8000/a.json",
+                                   "b": "http://localhost:8000/missing.json"})
+print(responses, failures)
+fetcher.close()
+@endcode
 """
 
 import asyncio
 import aiohttp
 import json
-from abstracter.util.settings import PROXY
+import threading
+import urllib.parse
+from collections import OrderedDict
+from concurrent.futures import Future
+from abstracter.util.settings import PROXY, RESPONSE_CACHE, RESPONSE_CACHE_TTL, RESPONSE_CACHE_SIZE
+from abstracter.util.settings import MAX_CONCURRENT_REQUESTS, REQUESTS_PER_SECOND, REQUEST_TIMEOUT
+from abstracter.util.settings import MAX_RETRIES, RETRY_BACKOFF
+from abstracter.util.response_cache import ResponseCache, canonical_url
+from abstracter.util import metrics
+
+###########################
+# Number of responses kept in memory.
+############################
+
+MEMORY_RESPONSES = 10000
+
+# Cache of each thread.
+_LOCAL = threading.local()
+
+# Protects _MEMORY, _IN_FLIGHT, _STATS and _FETCHER.
+_LOCK = threading.Lock()
 
-CONNECTOR = aiohttp.ProxyConnector(proxy=PROXY) if PROXY else None
+# Fetcher shared by all the threads.
+_FETCHER = [None]
 
+# canonical url : last responses (decoded JSON), oldest first.
+_MEMORY = OrderedDict()
 
-@asyncio.coroutine
-def fetch_page(tag, url, dict, parsing_method=None):
+# canonical url : Future of the response, for urls being requested.
+_IN_FLIGHT = dict()
+
+_STATS = {'urls': 0, 'duplicates': 0, 'memory': 0, 'coalesced': 0,
+          'cache': 0, 'fetched': 0, 'failed': 0}
+
+
+def request_stats():
     """
-    @param parsing_method A method to apply to a JSON result.
+    @return A dict of counters, since the beginning of the process :
+    'urls' asked to requests, 'duplicates' (same canonical url in a call),
+    found in 'memory', 'coalesced' with a request of another thread,
+    found in the 'cache', 'fetched' and 'failed' requests, and
+    'saved' (urls which were not requested).
+    """
+    with _LOCK:
+        stats = dict(_STATS)
+    stats['saved'] = stats['duplicates'] + stats['memory'] + stats['coalesced'] + stats['cache']
+    return stats
 
-    @see abstracter.conceptnet5_client.result
+
+def _count(key, number=1):
+    with _LOCK:
+        _STATS[key] += number
+    metrics.count('requests.' + key, number)
+
+
+def _remember(key, raw):
+    with _LOCK:
+        _MEMORY[key] = raw
+        _MEMORY.move_to_end(key)
+        while len(_MEMORY) > MEMORY_RESPONSES:
+            _MEMORY.popitem(last=False)
+
+
+def get_cache():
     """
-    response = yield from aiohttp.request(
-        'GET', url,
-        connector=CONNECTOR,
-    )
-    if response.status == 200:
-        # print("data fetched successfully for: %s" % url)
-        raw = yield from response.json()
-        dict[tag] = parsing_method(raw) if parsing_method else raw
-    else:
-        print("data fetch failed for: %s" % url)
-        print(response.content, response.status)
+    @return The ResponseCache given by the settings (opened once
+    in each thread), or None.
+    """
+    if getattr(_LOCAL, 'cache', None) is None and RESPONSE_CACHE:
+        _LOCAL.cache = ResponseCache(RESPONSE_CACHE, ttl=RESPONSE_CACHE_TTL,
+                                     max_size=RESPONSE_CACHE_SIZE)
+    return getattr(_LOCAL, 'cache', None)
+
+
+def close_cache():
+    """
+    Closes the ResponseCache of the current thread, if it was opened.
+    """
+    if getattr(_LOCAL, 'cache', None) is not None:
+        _LOCAL.cache.close()
+        _LOCAL.cache = None
+
+
+def get_fetcher():
+    """
+    @return The Fetcher given by the settings (created once, shared by all the threads).
+    """
+    with _LOCK:
+        if _FETCHER[0] is None:
+            _FETCHER[0] = Fetcher()
+        return _FETCHER[0]
 
 
-def requests(urls, parsing_method=None):
+def close_fetcher():
+    """
+    Closes the shared Fetcher (its session and event loop), if any.
+    """
+    with _LOCK:
+        fetcher = _FETCHER[0]
+        _FETCHER[0] = None
+    if fetcher is not None:
+        fetcher.close()
+
+
+class FetchFailure:
+    """
+    @class FetchFailure
+    @brief A request which failed.
+
+    status is the HTTP status of the last attempt (None if there was
+    no response), error the exception raised (None if there was a response).
+    """
+
+    def __init__(self, tag, url, status=None, error=None, attempts=1):
+        self.tag = tag
+        self.url = url
+        self.status = status
+        self.error = error
+        self.attempts = attempts
+
+    def __repr__(self):
+        return "FetchFailure(%r, status=%r, error=%r, attempts=%i)" % (
+            self.url, self.status, self.error, self.attempts)
+
+
+class RateLimiter:
+    """
+    @class RateLimiter
+    @brief Spaces out the requests sent to each host.
+    """
+
+    def __init__(self, per_second):
+        """
+        @param per_second Maximum number of requests per second
+        to a same host (None : no limit).
+        """
+        self.interval = 1 / per_second if per_second else 0
+        # host : time at which the next request can be sent.
+        self.next = dict()
+
+    @asyncio.coroutine
+    def wait(self, host):
+        if not self.interval:
+            return
+        now = asyncio.get_event_loop().time()
+        at = max(now, self.next.get(host, now))
+        self.next[host] = at + self.interval
+        if at > now:
+            yield from asyncio.sleep(at - now)
+
+
+class Fetcher:
+    """
+    @class Fetcher
+    @brief Sends concurrent GET requests, and decodes their JSON responses.
+
+    Requests are sent by an event loop running in a thread of the Fetcher
+    (started by the first run), thus run can be called from several threads :
+    max_concurrent and per_second hold for all of them.
+    """
+
+    def __init__(self, max_concurrent=MAX_CONCURRENT_REQUESTS, per_second=REQUESTS_PER_SECOND,
+                 timeout=REQUEST_TIMEOUT, retries=MAX_RETRIES, backoff=RETRY_BACKOFF,
+                 proxy=PROXY):
+        """
+        @param max_concurrent Maximum number of requests at a time.
+        @param per_second Maximum number of requests per second to a same host.
+        @param timeout Timeout of each attempt, in seconds.
+        @param retries Number of retries after a timeout or a server error.
+        @param backoff Waiting time before the first retry, in seconds,
+        doubled at each retry.
+        @param proxy Proxy url, or None.
+        """
+        self.max_concurrent = max_concurrent
+        self.limiter = RateLimiter(per_second)
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.proxy = proxy
+        self.session = None
+        # created in the event loop
+        self.semaphore = None
+        self.loop = None
+        self.thread = None
+        # Protects loop and thread.
+        self.lock = threading.Lock()
+
+    def _session(self):
+        if self.session is None:
+            connector = aiohttp.ProxyConnector(proxy=self.proxy) if self.proxy else aiohttp.TCPConnector()
+            self.session = aiohttp.ClientSession(connector=connector)
+        return self.session
+
+    def _start(self):
+        """
+        @return The event loop of the Fetcher (started if needed).
+        """
+        with self.lock:
+            if self.thread is None:
+                self.loop = asyncio.new_event_loop()
+                self.thread = threading.Thread(target=self._run_loop, daemon=True)
+                self.thread.start()
+            return self.loop
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def close(self):
+        """
+        Stops the event loop (requests being sent are cancelled), and closes the session.
+        """
+        with self.lock:
+            if self.thread is None:
+                return
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+            all_tasks = getattr(asyncio, 'all_tasks', None) or asyncio.Task.all_tasks
+            tasks = [t for t in all_tasks(self.loop) if not t.done()]
+            for task in tasks:
+                task.cancel()
+            if tasks:
+                self.loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            if self.session is not None:
+                closing = self.session.close()
+                if asyncio.iscoroutine(closing):
+                    self.loop.run_until_complete(closing)
+                self.session = None
+            self.loop.close()
+            self.loop = None
+            self.thread = None
+            self.semaphore = None
+
+    @staticmethod
+    def _retry(status):
+        return status >= 500 or status == 429
+
+    @asyncio.coroutine
+    def fetch(self, tag, url, semaphore):
+        """
+        @return [tag, url, decoded JSON] or a FetchFailure.
+        """
+        host = urllib.parse.urlsplit(url).netloc
+        status = None
+        error = None
+        loop = asyncio.get_event_loop()
+        for attempt in range(self.retries + 1):
+            if attempt:
+                metrics.count('http.retries')
+                yield from asyncio.sleep(self.backoff * 2 ** (attempt - 1))
+            waiting = loop.time()
+            yield from semaphore.acquire()
+            try:
+                yield from self.limiter.wait(host)
+                start = loop.time()
+                metrics.observe('http.wait', start - waiting)
+                metrics.count('http.attempts')
+                status = None
+                try:
+                    response = yield from asyncio.wait_for(self._session().get(url), self.timeout)
+                    status = response.status
+                    error = None
+                    if status == 200:
+                        try:
+                            raw = yield from asyncio.wait_for(response.json(), self.timeout)
+                        except ValueError as e:
+                            # a bad body : not sent again
+                            return FetchFailure(tag, url, status=status, error=e, attempts=attempt + 1)
+                        return [tag, url, raw]
+                    yield from response.release()
+                finally:
+                    metrics.observe('http.latency', loop.time() - start)
+                    metrics.count('http.errors' if status is None else 'http.status.' + status.__str__())
+            except (asyncio.TimeoutError, aiohttp.ClientError) as e:
+                # status is kept : None if there was no response
+                error = e
+            finally:
+                semaphore.release()
+            if (status is not None and not self._retry(status)
+               and not isinstance(error, asyncio.TimeoutError)):
+                break
+        return FetchFailure(tag, url, status=status, error=error, attempts=attempt + 1)
+
+    @asyncio.coroutine
+    def fetch_all(self, urls):
+        """
+        @param urls A dict tag : url.
+        @return A dict tag : decoded JSON, and a list of FetchFailure.
+        """
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.max_concurrent)
+        results = yield from asyncio.gather(*[self.fetch(tag, url, self.semaphore)
+                                              for tag, url in urls.items()])
+        responses = dict()
+        failures = []
+        for result in results:
+            if isinstance(result, FetchFailure):
+                failures.append(result)
+            else:
+                responses[result[0]] = result[2]
+        return responses, failures
+
+    def run(self, urls):
+        """
+        Fetches urls, in the event loop of the Fetcher.
+
+        @param urls A dict tag : url.
+        @return A dict tag : decoded JSON, and a list of FetchFailure.
+        """
+        return asyncio.run_coroutine_threadsafe(self.fetch_all(urls), self._start()).result()
+
+
+def requests(urls, parsing_method=None, cache=True, failures=None):
     """
     @param urls : a dict of tag : url
+    @param parsing_method A method to apply to each JSON result.
+    @param cache If True, responses are read from (and written to) the cache.
+    @param failures If not None, a list to which FetchFailure objects are appended
+    (otherwise failures are printed).
     @result A dict containing the query result, in JSON, for each url.
+
+    @see abstracter.conceptnet5_client.result
+    """
+    with metrics.timer('requests'):
+        return _requests(urls, parsing_method, cache, failures)
+
+
+def _requests(urls, parsing_method, cache, failures):
+    # canonical url : url, and tags asking for it
+    keys = OrderedDict()
+    for tag, url in urls.items():
+        keys.setdefault(canonical_url(url), [url, []])[1].append(tag)
+    _count('urls', len(urls))
+    _count('duplicates', len(urls) - len(keys))
+    raw = dict()
+    owned = dict()
+    waited = dict()
+    with _LOCK:
+        for key in keys:
+            if key in _MEMORY:
+                raw[key] = _MEMORY[key]
+                _MEMORY.move_to_end(key)
+            elif key in _IN_FLIGHT:
+                waited[key] = _IN_FLIGHT[key]
+            else:
+                owned[key] = _IN_FLIGHT[key] = Future()
+    _count('memory', len(raw))
+    _count('coalesced', len(waited))
+    failed = []
+    try:
+        if owned:
+            raw.update(_request(dict((key, keys[key][0]) for key in owned), cache, failed))
+    finally:
+        with _LOCK:
+            for key, future in owned.items():
+                del _IN_FLIGHT[key]
+                future.set_result(raw.get(key))
+    for key, future in waited.items():
+        if future.result() is not None:
+            raw[key] = future.result()
+    result = {}
+    with metrics.timer('requests.parse'):
+        for key, response in raw.items():
+            parsed = parsing_method(response) if parsing_method else response
+            for tag in keys[key][1]:
+                result[tag] = parsed
+    if failures is not None:
+        failures.extend(failed)
+    else:
+        for failure in failed:
+            print("data fetch failed for: %s" % failure.url)
+            print(failure)
+    return result
+
+
+def _request(urls, cache, failures):
+    """
+    Reads responses from the cache, fetches the others.
+
+    @param urls A dict canonical url : url.
+    @param cache If True, the cache is used.
+    @param failures A list to which FetchFailure objects are appended.
+    @return A dict canonical url : decoded JSON.
     """
-    print("Launching " + len(urls).__str__() + " requests !")
-    dict = {}
-    loop = asyncio.get_event_loop()
-    f = asyncio.wait([(fetch_page(tag, urls[tag], dict, parsing_method)) for tag in (urls)])
-    loop.run_until_complete(f)
-    print("Requests finished ! Returning " + len(dict).__str__() + " objects !")
-    return dict
+    raw = dict()
+    response_cache = get_cache() if cache else None
+    to_fetch = urls
+    if response_cache is not None:
+        with metrics.timer('cache.get'):
+            cached = response_cache.get_many(urls.values())
+        to_fetch = {}
+        for key, url in urls.items():
+            if url in cached:
+                raw[key] = cached[url]
+            else:
+                to_fetch[key] = url
+        print(len(cached).__str__() + " responses found in cache.")
+        _count('cache', len(cached))
+    if to_fetch:
+        print("Launching " + len(to_fetch).__str__() + " requests !")
+        with metrics.timer('fetch'):
+            responses, failed = get_fetcher().run(to_fetch)
+        if response_cache is not None and responses:
+            with metrics.timer('cache.put'):
+                response_cache.put_many(dict((to_fetch[key], r) for key, r in responses.items()))
+        raw.update(responses)
+        failures.extend(failed)
+        _count('fetched', len(responses))
+        _count('failed', len(failed))
+        print("Requests finished ! Returning " + len(responses).__str__() + " objects !")
+    for key, response in raw.items():
+        _remember(key, response)
+    return raw
@@ -10,6 +10,13 @@ from __future__ import print_function, unicode_literals
 import json
 import sys
 import codecs
+from multiprocessing import Pool
+
+####################################
+# Size of the chunks read at once by read_json_batches (bytes).
+####################################
+
+CHUNK_SIZE = 1 << 22
 
 
 class JSONStreamWriter(object):
@@ -81,4 +88,69 @@ def read_json_stream(filename_or_stream, offsets=False):
                 yield (json.loads(line), offset)
             else:
                 yield json.loads(line)
-        offset += len(bline)
\ No newline at end of file
+        offset += len(bline)
+
+
+def read_json_chunks(filename_or_stream, chunk_size=CHUNK_SIZE):
+    """
+    Read a file in "JSON stream" format by big chunks of bytes.
+    Each chunk contains only complete lines.
+
+    @param filename_or_stream A filename, or a stream opened in binary mode.
+    @param chunk_size Approximate size of the chunks.
+    @return A generator of bytes.
+    """
+    if hasattr(filename_or_stream, 'read'):
+        stream = filename_or_stream
+    else:
+        stream = open(filename_or_stream, 'rb')
+    rest = b''
+    while True:
+        data = stream.read(chunk_size)
+        if not data:
+            break
+        data = rest + data
+        end = data.rfind(b'\n') + 1
+        if end == 0:
+            rest = data
+        else:
+            rest = data[end:]
+            yield data[:end]
+    if rest.strip():
+        yield rest
+    if stream is not filename_or_stream:
+        stream.close()
+
+
+def decode_json_chunk(chunk):
+    """
+    Decode all the lines of a chunk with a single call to json.loads.
+
+    @param chunk Bytes, containing complete lines of JSON objects.
+    @return The list of the decoded objects.
+    """
+    lines = [line.strip() for line in chunk.decode('utf-8').split('\n')]
+    return json.loads('[' + ','.join(line for line in lines if line) + ']')
+
+
+def read_json_batches(filename_or_stream, chunk_size=CHUNK_SIZE, processes=0):
+    """
+    @brief Read a stream of data in "JSON stream" format, by batches.
+
+    Same objects as read_json_stream, but the file is read by big
+    chunks and each chunk is decoded at once, which is much faster.
+
+    @param filename_or_stream A filename, or a stream opened in binary mode.
+    @param chunk_size Approximate size of the chunks (bytes).
+    @param processes If greater than 0, chunks are decoded in a pool of
+    processes (the order of the objects is kept).
+    @return A generator of lists of decoded objects.
+    """
+    chunks = read_json_chunks(filename_or_stream, chunk_size)
+    if processes > 0:
+        with Pool(processes) as pool:
+            for batch in pool.imap(decode_json_chunk, chunks):
+                yield batch
+    else:
+        for chunk in chunks:
+            yield decode_json_chunk(chunk)
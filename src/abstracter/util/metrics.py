@@ -0,0 +1,214 @@
+"""@file metrics.py
+@brief Counters and timers of long runs, written as JSON lines.
+
+Counters (count) and timers (timer, timed, timed_iter, observe) are
+shared by all the threads of the process. A timer keeps the number,
+total, minimum and maximum of its durations, and a histogram of them
+(HISTOGRAM_BOUNDS).
+
+write adds an event to the metrics file (util.settings.METRICS_FILE,
+or the file given to use_file), one JSON dict per line :
+@code
+{"time": 1428394519.2, "event": "batch", "position": 1200, "nodes": 415}
+@endcode
+report writes an event with the current counters and timers.
+
+Example :
+@code
+from abstracter.util import metrics
+
+metrics.use_file("metrics.jsons")
+with metrics.timer('parse'):
+    parse(data)
+metrics.count('edges', len(edges))
+metrics.report('done')
+@endcode
+
+Reading the file :
+@code
+from abstracter.util.json_stream import read_json_stream
+for event in read_json_stream("metrics.jsons"):
+    if event['event'] == 'done':
+        print(event['timers']['parse']['total'])
+@endcode
+
+@see util.settings.METRICS_FILE
+"""
+
+import bisect
+import contextlib
+import functools
+import json
+import threading
+import time
+from abstracter.util.settings import METRICS_FILE
+
+###########################
+# Upper bounds (in seconds) of the buckets of the timers'
+# histograms : 1 ms, 2 ms, 4 ms... about 2 minutes, then infinity.
+############################
+
+HISTOGRAM_BOUNDS = [0.001 * 2 ** k for k in range(18)]
+
+# Protects _COUNTERS, _TIMERS and the file.
+_LOCK = threading.Lock()
+
+_COUNTERS = dict()
+
+# name : Histogram
+_TIMERS = dict()
+
+# [file name, opened file] (the file name given by use_file,
+# otherwise METRICS_FILE).
+_FILE = [METRICS_FILE, None]
+
+
+class Histogram:
+    """
+    @class Histogram
+    @brief Durations measured by a timer.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+        self.buckets = [0] * (len(HISTOGRAM_BOUNDS) + 1)
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if self.min is None or seconds < self.min:
+            self.min = seconds
+        if self.max is None or seconds > self.max:
+            self.max = seconds
+        self.buckets[bisect.bisect_left(HISTOGRAM_BOUNDS, seconds)] += 1
+
+    def to_dict(self):
+        """
+        @return A JSON serializable dict : count, total, mean, min, max
+        and buckets ([upper bound, number of durations], None as
+        the last bound, for infinity ; empty buckets are omitted).
+        """
+        bounds = HISTOGRAM_BOUNDS + [None]
+        return {'count': self.count, 'total': self.total,
+                'mean': self.total / self.count if self.count else None,
+                'min': self.min, 'max': self.max,
+                'buckets': [[bounds[i], n] for i, n in enumerate(self.buckets) if n]}
+
+
+def count(name, number=1):
+    """
+    Adds number to a counter.
+    """
+    with _LOCK:
+        _COUNTERS[name] = _COUNTERS.get(name, 0) + number
+
+
+def observe(name, seconds):
+    """
+    Adds a duration to a timer.
+    """
+    with _LOCK:
+        if name not in _TIMERS:
+            _TIMERS[name] = Histogram()
+        _TIMERS[name].add(seconds)
+
+
+@contextlib.contextmanager
+def timer(name):
+    """
+    Measures the duration of a with block.
+    """
+    start = time.time()
+    try:
+        yield
+    finally:
+        observe(name, time.time() - start)
+
+
+def timed(name=None):
+    """
+    Decorator measuring the duration of each call of a function
+    (timer named after the function if name is None).
+    """
+    def decorator(function):
+        timer_name = name or function.__name__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with timer(timer_name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def timed_iter(iterable, name):
+    """
+    @return A generator of the elements of iterable, measuring
+    the time taken to get each of them.
+    """
+    iterator = iter(iterable)
+    while True:
+        start = time.time()
+        try:
+            element = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            observe(name, time.time() - start)
+        yield element
+
+
+def snapshot():
+    """
+    @return A dict : 'counters' (name : value) and
+    'timers' (name : Histogram.to_dict()).
+    """
+    with _LOCK:
+        return {'counters': dict(_COUNTERS),
+                'timers': dict((name, h.to_dict()) for name, h in _TIMERS.items())}
+
+
+def reset():
+    with _LOCK:
+        _COUNTERS.clear()
+        _TIMERS.clear()
+
+
+def use_file(filename):
+    """
+    Writes the next events to filename (appended ; None : no events written).
+    """
+    with _LOCK:
+        if _FILE[1] is not None:
+            _FILE[1].close()
+        _FILE[0] = filename
+        _FILE[1] = None
+
+
+def write(event, **fields):
+    """
+    Appends an event to the metrics file, if any.
+
+    @param event Name of the event.
+    @param fields JSON serializable values.
+    """
+    with _LOCK:
+        if not _FILE[0]:
+            return
+        if _FILE[1] is None:
+            _FILE[1] = open(_FILE[0], 'a', encoding='utf-8')
+        line = {'time': time.time(), 'event': event}
+        line.update(fields)
+        _FILE[1].write(json.dumps(line) + "\n")
+        _FILE[1].flush()
+
+
+def report(event, **fields):
+    """
+    Appends an event with the current counters and timers (see snapshot).
+    """
+    fields.update(snapshot())
+    write(event, **fields)
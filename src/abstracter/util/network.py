@@ -19,6 +19,7 @@ for v in n.outArcs("toto"):
 import networkx as nx
 from networkx.readwrite import json_graph
 import matplotlib.pyplot as plt
+import itertools
 import json
 
 
@@ -40,12 +41,21 @@ class Network:
     def __iter__(self):
         return self.network.nodes_iter(data=False)
 
+    def __contains__(self, id):
+        return self.network.has_node(id)
+
     def nodes_iter(self):
         return self.network.nodes_iter(data=True)
 
     def get_node(self, id):
         return self.network.node[id]
 
+    def set_node_data(self, id, data):
+        """
+        Replaces the attributes dict of an existing node.
+        """
+        self.network.node[id] = data
+
     def add_node(self, id, **kwargs):
         self.network.add_node(id)
         for akey, avalue in kwargs.items():
@@ -93,6 +103,9 @@ class Network:
     def in_arcs(self, id):
         return self.network.in_edges_iter(id, data=True, keys=True)
 
+    def in_degree(self, id):
+        return sum(len(keys) for keys in self.network.pred[id].values())
+
     def nodes(self, data=True):
         return self.network.nodes(data)
 
@@ -105,6 +118,35 @@ class Network:
     def add_nodes_from(self, it):
         self.network.add_nodes_from(it)
 
+    ###########################################################
+    # Bulk treatments (a few sweeps over the whole network)
+    ##############################################
+
+    def number_of_nodes(self):
+        return self.network.number_of_nodes()
+
+    def neighbour_counts(self, id):
+        """
+        @return (number of predecessors, number of successors) of a node.
+        """
+        return len(self.network.pred[id]), len(self.network.succ[id])
+
+    def select_nodes(self, predicate, limit=None):
+        """
+        @param predicate Function (id, attributes) -> bool.
+        @param limit Only the limit first nodes (order of nodes()) are looked at.
+        @return The list of the ids of the selected nodes.
+        """
+        return [id for id, data in itertools.islice(self.nodes_iter(), limit)
+                if predicate(id, data)]
+
+    def remove_nodes_from(self, ids):
+        """
+        Removes nodes (and their edges) at once.
+        Ids which are not in the network are ignored.
+        """
+        self.network.remove_nodes_from(ids)
+
     def add_edges_from(self, it):
         self.network.add_edges_from(it)
 
@@ -121,11 +163,13 @@ class Network:
             self.network = json_graph.node_link_graph(json.load(file))
 
     def draw(self, filename=None):
-        pos = nx.spring_layout(self.network, dim=2, weight='w', scale=1)
-        nx.draw_networkx_nodes(self.network, pos=pos, font_family='sans-serif')
-        nx.draw_networkx_edges(self.network, pos=pos, font_family='sans-serif')
-        nx.draw_networkx_labels(self.network, pos=pos, font_family='sans-serif')
-        # nx.draw_networkx_edge_labels(self.network, pos=pos, font_family='sans-serif')
+        # built once (a copy, in subclasses not using networkx)
+        network = self.network
+        pos = nx.spring_layout(network, dim=2, weight='w', scale=1)
+        nx.draw_networkx_nodes(network, pos=pos, font_family='sans-serif')
+        nx.draw_networkx_edges(network, pos=pos, font_family='sans-serif')
+        nx.draw_networkx_labels(network, pos=pos, font_family='sans-serif')
+        # nx.draw_networkx_edge_labels(network, pos=pos, font_family='sans-serif')
         if filename:
             plt.savefig(filename)
         plt.show()
@@ -139,17 +183,18 @@ class Network:
         """
         Pretty drawing, for very small networks only.
         """
-        graph_pos = nx.spring_layout(self.network, k=0.2, iterations=40)
-        nx.draw_networkx_nodes(self.network, graph_pos, node_size=node_size,
+        network = self.network
+        graph_pos = nx.spring_layout(network, k=0.2, iterations=40)
+        nx.draw_networkx_nodes(network, graph_pos, node_size=node_size,
                                alpha=node_alpha, node_color=node_color)
-        nx.draw_networkx_edges(self.network, graph_pos, width=edge_tickness,
+        nx.draw_networkx_edges(network, graph_pos, width=edge_tickness,
                                alpha=edge_alpha, edge_color=edge_color)
-        nx.draw_networkx_labels(self.network, graph_pos, font_size=node_text_size,
+        nx.draw_networkx_labels(network, graph_pos, font_size=node_text_size,
                                 font_family=text_font)
         labels = {}
         for e in self.edges(data=False):
             labels[e] = self.get_edge(e[0], e[1])['r']
-        nx.draw_networkx_edge_labels(self.network, graph_pos, edge_labels=labels,
+        nx.draw_networkx_edge_labels(network, graph_pos, edge_labels=labels,
                                      label_pos=edge_text_pos)
         if filename:
             plt.savefig(filename)
@@ -0,0 +1,189 @@
+"""@file response_cache.py
+@brief Persistent cache of the responses of web APIs.
+
+Building a network sends thousands of requests (lookup, search,
+association, freebase search), and a new build (rc4, then rc5)
+sends most of them again. The JSON responses are stored in a
+SQLite file, by canonical url, and util.concurrent.requests only
+fetches the urls which are not in the cache.
+
+The canonical url of a query has its parameters sorted, and the
+api key removed : the same query always gives the same entry,
+whatever the order of the arguments given to lookup_url, search_url...
+
+Example :
+@code
+cache = ResponseCache("responses.sqlite", ttl=30 * 24 * 3600)
+found = cache.get_many([url1, url2])  # url : raw JSON response
+cache.put_many({url3: response3})
+print(cache.stats())
+@endcode
+
+@see util.settings.RESPONSE_CACHE
+@see concurrent.py
+"""
+
+import hashlib
+import json
+import sqlite3
+import time
+import urllib.parse
+
+###########################
+# Query parameters which do not change the response.
+############################
+
+IGNORED_PARAMETERS = ['key']
+
+
+def canonical_url(url):
+    """
+    @return The url, with its query parameters sorted,
+    without IGNORED_PARAMETERS.
+    """
+    parts = urllib.parse.urlsplit(url)
+    query = [(k, v) for k, v in urllib.parse.parse_qsl(parts.query, keep_blank_values=True)
+             if k not in IGNORED_PARAMETERS]
+    query.sort()
+    return urllib.parse.urlunsplit((parts.scheme, parts.netloc, parts.path,
+                                    urllib.parse.urlencode(query), ''))
+
+
+def url_key(url):
+    """
+    @return The key of an url in the cache (sha1 of its canonical form).
+    """
+    return hashlib.sha1(canonical_url(url).encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """
+    @class ResponseCache
+    @brief JSON responses stored in a SQLite file.
+
+    Entries older than ttl seconds are ignored (and deleted).
+    When the stored responses take more than max_size bytes,
+    the least recently used ones are deleted.
+    """
+
+    def __init__(self, filename, ttl=None, max_size=None):
+        """
+        @param filename The SQLite file (created if needed).
+        @param ttl Time to live of an entry, in seconds (None : forever).
+        @param max_size Maximum size of the responses, in bytes (None : no limit).
+        """
+        self.filename = filename
+        self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.connection = sqlite3.connect(filename, timeout=60)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, url TEXT, body TEXT, size INTEGER, "
+            "created REAL, accessed REAL)")
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+    def _expired(self, created, now):
+        return self.ttl is not None and created + self.ttl < now
+
+    def get(self, url):
+        """
+        @return The response (decoded JSON) cached for an url, or None.
+        """
+        return self.get_many([url]).get(url)
+
+    def get_many(self, urls):
+        """
+        @param urls Iterable of urls.
+        @return A dict url : response, for the urls found in the cache.
+        """
+        now = time.time()
+        found = dict()
+        expired = []
+        accessed = []
+        for url in urls:
+            key = url_key(url)
+            row = self.connection.execute(
+                "SELECT body, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+            elif self._expired(row[1], now):
+                self.misses += 1
+                expired.append((key,))
+            else:
+                self.hits += 1
+                found[url] = json.loads(row[0])
+                accessed.append((now, key))
+        if expired:
+            self.connection.executemany("DELETE FROM responses WHERE key = ?", expired)
+        if accessed:
+            self.connection.executemany("UPDATE responses SET accessed = ? WHERE key = ?", accessed)
+        self.connection.commit()
+        return found
+
+    def put(self, url, response):
+        self.put_many({url: response})
+
+    def put_many(self, responses):
+        """
+        @param responses A dict url : response (JSON serializable).
+        """
+        now = time.time()
+        rows = []
+        for url, response in responses.items():
+            body = json.dumps(response)
+            rows.append((url_key(url), canonical_url(url), body, len(body), now, now))
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)", rows)
+        self.evict()
+        self.connection.commit()
+
+    def size(self):
+        """
+        @return Total size of the cached responses, in bytes.
+        """
+        return self.connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def evict(self):
+        """
+        Deletes expired entries, then least recently used
+        entries while the cache is bigger than max_size.
+        """
+        if self.ttl is not None:
+            self.connection.execute("DELETE FROM responses WHERE created < ?",
+                                    (time.time() - self.ttl,))
+        if self.max_size is None:
+            return
+        excess = self.size() - self.max_size
+        if excess <= 0:
+            return
+        removed = []
+        for key, size in self.connection.execute(
+                "SELECT key, size FROM responses ORDER BY accessed"):
+            if excess <= 0:
+                break
+            removed.append((key,))
+            excess -= size
+        self.connection.executemany("DELETE FROM responses WHERE key = ?", removed)
+
+    def clear(self):
+        self.connection.execute("DELETE FROM responses")
+        self.connection.commit()
+
+    def stats(self):
+        """
+        @return A dict : hits and misses since the cache was opened,
+        number of entries and size in bytes.
+        """
+        return {'hits': self.hits, 'misses': self.misses,
+                'entries': len(self), 'size': self.size()}
@@ -1,8 +1,10 @@
 """@file settings.py
-Proxy settings for web utils.
+Proxy and cache settings for web utils.
 
 @see http.py
 @see concurrent.py
+@see response_cache.py
+@see metrics.py
 """
 
 HTTPS_PROXY = {'https': 'http://kuzh.polytechnique.fr:8080'}
@@ -12,3 +14,37 @@ HTTP_PROXY = {'http': 'http://kuzh.polytechnique.fr:8080'}
 
 PROXY = 'http://kuzh.polytechnique.fr:8080'
 #PROXY = None
+
+###########################
+# Cache of the responses of web APIs (see response_cache.py).
+# RESPONSE_CACHE is the SQLite file (None : no cache), entries expire
+# after RESPONSE_CACHE_TTL seconds, and the least recently used ones
+# are deleted above RESPONSE_CACHE_SIZE bytes.
+############################
+
+RESPONSE_CACHE = 'responses.sqlite'
+#RESPONSE_CACHE = None
+RESPONSE_CACHE_TTL = 90 * 24 * 3600
+RESPONSE_CACHE_SIZE = 2 * 1024 ** 3
+
+###########################
+# Concurrent requests (see concurrent.py) : at most MAX_CONCURRENT_REQUESTS
+# requests at a time, at most REQUESTS_PER_SECOND to a same host,
+# REQUEST_TIMEOUT seconds per attempt, and MAX_RETRIES retries
+# (waiting RETRY_BACKOFF, 2 * RETRY_BACKOFF, 4 * RETRY_BACKOFF... seconds)
+# after a timeout or a server error.
+############################
+
+MAX_CONCURRENT_REQUESTS = 20
+REQUESTS_PER_SECOND = 10
+REQUEST_TIMEOUT = 30
+MAX_RETRIES = 3
+RETRY_BACKOFF = 1
+
+###########################
+# Counters and timers of long runs (see metrics.py) are written
+# as JSON lines to METRICS_FILE (None : not written).
+############################
+
+METRICS_FILE = None
+#METRICS_FILE = 'metrics.jsons'
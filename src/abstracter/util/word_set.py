@@ -0,0 +1,234 @@
+"""@file word_set.py
+@brief Persistent sets of words, for very big vocabularies.
+
+A WordSet is saved in two files :
+* "....words" : the words, sorted (as utf-8 bytes), one per line,
+* "....bloom" : a Bloom filter of these words.
+
+Loading maps the sorted file in memory (mmap) and reads the Bloom
+filter at once : words are not read, nor kept in memory. To know if
+a word is in the set, the Bloom filter answers "no" for most words
+which are not ; otherwise, the word is searched in the sorted file
+(binary search). Words added since the set was loaded are kept in memory
+until the set is saved again.
+
+Example :
+@code
+words = WordSet()
+words.add("wayne_rooney")
+words.save("rc/rc_black_list")
+
+words = WordSet.load("rc/rc_black_list")
+print("wayne_rooney" in words, len(words))
+@endcode
+"""
+
+import hashlib
+import heapq
+import math
+import mmap
+import os
+import struct
+
+###########################
+# Wanted false positive rate of the Bloom filters.
+############################
+
+ERROR_RATE = 0.01
+
+# Header of a .bloom file : number of bits, of hash functions, of words.
+_HEADER = struct.Struct('<QQQ')
+
+
+class BloomFilter:
+    """
+    @class BloomFilter
+    @brief Set of words which may answer "yes" for words it does not contain.
+    """
+
+    def __init__(self, capacity, error_rate=ERROR_RATE, bits=None, hashes=None):
+        """
+        @param capacity Number of words expected.
+        @param error_rate Wanted probability of false positives (with capacity words).
+        @param bits, hashes Size of the filter and number of hash functions
+        (computed from capacity and error_rate if None).
+        """
+        capacity = max(capacity, 1)
+        if bits is None:
+            bits = int(-capacity * math.log(error_rate) / math.log(2) ** 2) + 1
+        if hashes is None:
+            hashes = max(1, int(round(bits / capacity * math.log(2))))
+        self.bits = bits
+        self.hashes = hashes
+        self.count = 0
+        self.array = bytearray((bits + 7) // 8)
+
+    def _positions(self, word):
+        digest = hashlib.blake2b(word.encode('utf-8'), digest_size=16).digest()
+        h1, h2 = struct.unpack('<QQ', digest)
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def add(self, word):
+        for p in self._positions(word):
+            self.array[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+
+    def __contains__(self, word):
+        for p in self._positions(word):
+            if not self.array[p >> 3] & (1 << (p & 7)):
+                return False
+        return True
+
+    def save(self, filename):
+        with open(filename, 'wb') as file:
+            file.write(_HEADER.pack(self.bits, self.hashes, self.count))
+            file.write(self.array)
+
+    @classmethod
+    def load(cls, filename):
+        with open(filename, 'rb') as file:
+            bits, hashes, count = _HEADER.unpack(file.read(_HEADER.size))
+            bloom = cls(1, bits=bits, hashes=hashes)
+            bloom.count = count
+            bloom.array = bytearray(file.read())
+        return bloom
+
+
+class WordSet:
+    """
+    @class WordSet
+    @brief A set of words (add, in, len, iteration), saved in a sorted
+    file with a Bloom filter.
+    """
+
+    def __init__(self, words=()):
+        # Words added since the set was loaded.
+        self.added = set()
+        # Bloom filter of the saved words only.
+        self.bloom = BloomFilter(1024)
+        self.file = None
+        self.map = None
+        self.saved = 0
+        for word in words:
+            self.add(word)
+
+    @classmethod
+    def load(cls, filename):
+        """
+        @param filename Name of the files, without extension
+        ("rc/rc_black_list" for "rc/rc_black_list.words" and "rc/rc_black_list.bloom").
+        """
+        words = cls()
+        words.open(filename)
+        return words
+
+    def open(self, filename):
+        """
+        Adds the words saved in filename (without extension) to the set.
+        If the set was not loaded from other files, they are not read.
+        """
+        if self.file is not None:
+            other = WordSet.load(filename)
+            for word in other:
+                self.add(word)
+            other.close()
+            return
+        added = self.added
+        self.added = set()
+        self.bloom = BloomFilter.load(filename + ".bloom")
+        self.saved = self.bloom.count
+        self.file = open(filename + ".words", 'rb')
+        if os.path.getsize(filename + ".words") > 0:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        for word in added:
+            self.add(word)
+
+    @staticmethod
+    def exists(filename):
+        return os.path.isfile(filename + ".words") and os.path.isfile(filename + ".bloom")
+
+    def close(self):
+        """
+        Closes the saved files : the saved words are no longer in the set.
+        """
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        self.saved = 0
+
+    def _saved_contains(self, key):
+        """
+        Binary search of a word (utf-8 bytes) in the sorted file.
+        """
+        if self.map is None:
+            return False
+        low = 0
+        high = len(self.map)
+        while low < high:
+            middle = (low + high) // 2
+            start = self.map.rfind(b'\n', 0, middle) + 1
+            end = self.map.find(b'\n', start)
+            if end < 0:
+                end = len(self.map)
+            line = self.map[start:end]
+            if line == key:
+                return True
+            if line < key:
+                low = end + 1
+            else:
+                high = start
+        return False
+
+    def __contains__(self, word):
+        if word in self.added:
+            return True
+        if word not in self.bloom:
+            return False
+        return self._saved_contains(word.encode('utf-8'))
+
+    def add(self, word):
+        if word not in self:
+            # not in the Bloom filter, which is rebuilt by save()
+            self.added.add(word)
+
+    def __len__(self):
+        return self.saved + len(self.added)
+
+    def _saved_words(self):
+        if self.map is None:
+            return
+        for line in iter(self.map.readline, b''):
+            yield line.rstrip(b'\n')
+
+    def __iter__(self):
+        if self.map is not None:
+            self.map.seek(0)
+            for line in self._saved_words():
+                yield line.decode('utf-8')
+        for word in self.added:
+            yield word
+
+    def save(self, filename):
+        """
+        Writes the set (merging the saved words and the added ones),
+        and reloads it from the new files.
+
+        @param filename Name of the files, without extension.
+        """
+        bloom = BloomFilter(len(self))
+        if self.map is not None:
+            self.map.seek(0)
+        added = sorted(word.encode('utf-8') for word in self.added)
+        with open(filename + ".words.tmp", 'wb') as file:
+            for key in heapq.merge(self._saved_words(), added):
+                file.write(key + b'\n')
+                bloom.add(key.decode('utf-8'))
+        bloom.save(filename + ".bloom.tmp")
+        self.close()
+        os.replace(filename + ".words.tmp", filename + ".words")
+        os.replace(filename + ".bloom.tmp", filename + ".bloom")
+        self.added = set()
+        self.open(filename)
@@ -0,0 +1,127 @@
+"""
+@file edge_parsing_benchmark.py
+@author PSC INF02
+
+@brief Benchmark of conceptnet5_client.result.parse_relevant_edges.
+
+Parses a corpus of lookup and search responses :
+* with the former parsing (an Edge is built for every edge, through
+ast.literal_eval, then filtered),
+* with the current one.
+Both must give the same edges.
+
+The corpus is read from the response cache (util.settings.RESPONSE_CACHE)
+if it contains conceptnet responses, otherwise random responses are built.
+
+> python3 edge_parsing_benchmark.py [cache file] [repetitions]
+"""
+
+from abstracter.conceptnet5_client.result import parse_relevant_edges
+import abstracter.conceptnet5_client.data_settings as data_settings
+from abstracter.util.settings import RESPONSE_CACHE
+import ast
+import json
+import os
+import random
+import sqlite3
+import sys
+import time
+
+
+class OldEdge(object):
+    """
+    Former result.Edge.
+    """
+
+    def __init__(self, edge_str):
+        edge_dict = ast.literal_eval(str(edge_str))
+        for attribute in data_settings.RELEVANT_EDGES_ATTRIBUTES:
+            self.__dict__[attribute] = (edge_dict[attribute])
+
+
+def old_parse_relevant_edges(json_data, clean_self_ref=True):
+    """
+    Former result.parse_relevant_edges.
+    """
+    edges = []
+    if 'edges' not in json_data:
+        return edges
+    for edge_str in json_data['edges']:
+        e = OldEdge(edge_str)
+        if e.rel in data_settings.USEFUL_CONCEPTNET_EDGES:
+            e.rel = e.rel.split('/')[2]
+            e.start = e.start.split('/')[3]
+            e.end = e.end.split('/')[3]
+            if (len(e.start.split('_')) < data_settings.MAX_UNDERSCORES_ALLOWED + 2
+               and len(e.end.split('_')) < data_settings.MAX_UNDERSCORES_ALLOWED + 2):
+                if clean_self_ref:
+                    if e.start != e.end:
+                        edges.append(e)
+                else:
+                    edges.append(e)
+    return edges
+
+
+def recorded_corpus(filename):
+    """
+    @return The responses with edges stored in a response cache.
+    """
+    if not filename or not os.path.isfile(filename):
+        return []
+    connection = sqlite3.connect(filename)
+    corpus = []
+    for row in connection.execute("SELECT body FROM responses WHERE url LIKE '%conceptnet%'"):
+        response = json.loads(row[0])
+        if isinstance(response, dict) and 'edges' in response:
+            corpus.append(response)
+    connection.close()
+    return corpus
+
+
+def random_corpus(responses=500, edges=10, seed=0):
+    """
+    @return Responses looking like conceptnet5.3 search results.
+    """
+    rand = random.Random(seed)
+    words = ["dog", "cat", "animal", "fur", "pet", "house", "kennel", "bark",
+             "small_dog", "very_small_brown_dog", "tree", "water"]
+    rels = list(data_settings.USEFUL_CONCEPTNET_EDGES) + data_settings.NOT_USEFUL_CONCEPTNET_EDGES
+    corpus = []
+    for r in range(responses):
+        result = []
+        for e in range(edges):
+            start = "/c/en/" + rand.choice(words)
+            end = "/c/en/" + rand.choice(words) + rand.choice(["", "/n"])
+            rel = rand.choice(rels)
+            result.append({'start': start, 'end': end, 'rel': rel,
+                           'weight': rand.randint(1, 40) / 10,
+                           'uri': "/a/[" + rel + "/," + start + "/," + end + "/]",
+                           'dataset': "/d/conceptnet/5/en", 'license': "/l/CC/By",
+                           'sources': ["/s/contributor/omcs/someone"],
+                           'surfaceText': "[[a]] is related to [[b]]",
+                           'context': "/ctx/all", 'features': [start + " " + rel + " -"]})
+        corpus.append({'numFound': edges, 'edges': result})
+    return corpus
+
+
+def run(parse, corpus, repetitions):
+    start = time.time()
+    for i in range(repetitions):
+        parsed = [parse(response) for response in corpus]
+    return time.time() - start, parsed
+
+
+if __name__ == "__main__":
+    corpus = recorded_corpus(sys.argv[1] if sys.argv[1:] else RESPONSE_CACHE)
+    if not corpus:
+        corpus = random_corpus()
+    repetitions = int(sys.argv[2]) if sys.argv[2:] else 10
+    print("%i responses, %i edges." % (len(corpus), sum(len(r['edges']) for r in corpus)))
+    results = []
+    for parse in [old_parse_relevant_edges, parse_relevant_edges]:
+        seconds, parsed = run(parse, corpus, repetitions)
+        print("%s : %.3f s (%.1f us / edge)." %
+              (parse.__name__, seconds,
+               1e6 * seconds / repetitions / max(1, sum(len(r['edges']) for r in corpus))))
+        results.append([[(e.start, e.rel, e.end, e.weight) for e in edges] for edges in parsed])
+    print("Same edges : " + (results[0] == results[1]).__str__())
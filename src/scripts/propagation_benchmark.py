@@ -0,0 +1,86 @@
+"""
+@file propagation_benchmark.py
+@author PSC INF02
+
+@brief Micro-benchmark of ConceptNetwork.propagate.
+
+Builds a random network (20 000 nodes, 100 000 edges), then times
+propagation steps for several documents (a few random seeds are activated,
+propagated, then the network is deactivated), as in a WorkspacePrunner :
+* without cache : the normalisation of each neighbour is computed
+again at each step, from the list of its entrant edges,
+* with the cached normalisation of ConceptNetwork.
+
+The documents are processed several times : the first pass fills
+the cache, the next ones use it as a loaded network would.
+Both give exactly the same activations. The garbage collector is
+paused during propagation, so that it does not blur the timings.
+
+> python3 propagation_benchmark.py [nodes] [edges] [steps] [documents] [passes]
+"""
+
+from abstracter.concepts_network import ConceptNetwork, divlog
+import gc
+import random
+import sys
+import time
+
+
+class UncachedConceptNetwork(ConceptNetwork):
+    """
+    Former behaviour : no cache of the normalisation.
+    """
+
+    def normaliser(self, id):
+        return 100 * divlog(len(list(self.in_arcs(id))))
+
+
+def random_network(cn, nodes, edges, seed=0):
+    rand = random.Random(seed)
+    ids = ["node_" + i.__str__() for i in range(nodes)]
+    cn.add_nodes_from([id, {'a': 0, 'ic': rand.randint(20, 90)}] for id in ids)
+    cn.add_edges_from([rand.choice(ids), rand.choice(ids), k, {'w': rand.randint(1, 100), 'r': "RelatedTo"}]
+                      for k in range(edges))
+    return ids
+
+
+def run(cn, ids, steps, documents, seed=1):
+    """
+    @return Time spent in propagation, and the activated nodes
+    at the end of each document.
+    """
+    rand = random.Random(seed)
+    seconds = 0
+    activated = []
+    gc.collect()
+    gc.disable()
+    for d in range(documents):
+        cn.activate(rand.sample(ids, 10), 60)
+        start = time.time()
+        for i in range(steps):
+            cn.propagate()
+        seconds += time.time() - start
+        activated.append(sorted((n, cn[n]['a']) for n in cn.active))
+        for n in list(cn.active):
+            cn[n]['a'] = 0
+    gc.enable()
+    return seconds, activated
+
+
+if __name__ == "__main__":
+    nodes = int(sys.argv[1]) if sys.argv[1:] else 20000
+    edges = int(sys.argv[2]) if sys.argv[2:] else 100000
+    steps = int(sys.argv[3]) if sys.argv[3:] else 4
+    documents = int(sys.argv[4]) if sys.argv[4:] else 10
+    passes = int(sys.argv[5]) if sys.argv[5:] else 3
+    results = []
+    for cls in [UncachedConceptNetwork, ConceptNetwork]:
+        cn = cls()
+        ids = random_network(cn, nodes, edges)
+        for p in range(passes):
+            seconds, activated = run(cn, ids, steps, documents)
+            print("%s, pass %i : %i steps in %.3f s (%.1f ms / step)." %
+                  (cls.__name__, p, steps * documents, seconds,
+                   1000 * seconds / (steps * documents)))
+            results.append(activated)
+    print("Same activations : " + all(r == results[0] for r in results).__str__())
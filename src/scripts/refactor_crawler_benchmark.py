@@ -0,0 +1,112 @@
+"""
+@file refactor_crawler_benchmark.py
+@author PSC INF02
+
+@brief Throughput of parsers.tokenizer.refactor_crawler.
+
+Refactors sample articles :
+* with the former refactor_crawler (character by character),
+* with the current one (one regular expression scan).
+Both must give the same sentences, for every article
+(exits with status 1 otherwise).
+
+Articles are read from a crawler directory (for example
+"../crawlerpsc/2015_03_29", containing i/j files) if one is given,
+otherwise articles are built from pieces of text showing the cases
+refactor_crawler deals with (glued titles, names like McDonald,
+several spaces, punctuation...).
+
+> python3 refactor_crawler_benchmark.py [crawler directory] [repetitions]
+
+@see refactor_crawler_golden.py Expected sentences of sample articles.
+"""
+
+from abstracter.parsers.tokenizer import refactor_crawler, _refactor, PUNKT2, CRAWLER_BOUNDARIES
+from glob import glob
+import random
+import sys
+import time
+
+
+def old_refactor_crawler(text):
+    """
+    Former tokenizer.refactor_crawler.
+    """
+    temp = []
+    sents = []
+    car2 = ' '
+    for car in _refactor(text):
+        if (car.isupper() and car2.islower()):
+            l = (''.join(temp)).split(' ')
+            if l[len(l) - 1] not in ["Mc", "M", "Mr", "Ms", "Mrs"]:
+                sents.append(''.join(temp))
+                temp = []
+            temp.append(car)
+        elif (car == ' ' and car2 == ' '):
+            sents.append(''.join(temp))
+            temp = []
+        elif car not in CRAWLER_BOUNDARIES:
+            temp.append(car)
+        else:
+            sents.append(''.join(temp))
+            temp = []
+        car2 = car
+    for sent in sents:
+        for p in PUNKT2:
+            sent = sent.replace(p, p + " ")
+        while sent and not sent[0].isalpha():
+            sent = sent[1:]
+        if sent and sent[len(sent) - 1].isalpha():
+            sent = sent + '.'
+        sent2 = sent.replace(" ", "")
+        if sent2 != "":
+            yield sent
+
+
+PIECES = ["Wayne Rooney scored twice", "in the Capital One Cup", "The semi-final",
+          "McDonald said", "Mr Smith", "Mrs. Jones", "M. Dupont", "MsWhite", "Mr", "Mc",
+          "  ", "   ", " ", ".", "!", "?", ":", "\n", "\t", "\"", "=", ",", ";", "/",
+          "(Reuters)", "- ", "...", "2-1", "42", "Manchester UnitedChelsea", "FC",
+          "Ligue 1", "Étienne Ébrard", "ÉtéÀ", "ßtraße", "ǅemal", "Ωmega", "iPhone",
+          "'s", "’", "[", "]", "_", "x", "A", "a"]
+
+
+def random_articles(articles=300, pieces=400, seed=0):
+    rand = random.Random(seed)
+    return [' '.join(rand.choice(PIECES) for p in range(pieces)) if a % 2 else
+            ''.join(rand.choice(PIECES) for p in range(pieces)) for a in range(articles)]
+
+
+def crawler_articles(directory):
+    articles = []
+    for filename in sorted(glob(directory.rstrip('/') + "/*/*")):
+        with open(filename, 'r') as file:
+            articles.append(file.read())
+    return articles
+
+
+def run(refactor, articles, repetitions):
+    start = time.time()
+    for i in range(repetitions):
+        sentences = [list(refactor(article)) for article in articles]
+    return time.time() - start, sentences
+
+
+if __name__ == "__main__":
+    articles = crawler_articles(sys.argv[1]) if sys.argv[1:] else random_articles()
+    repetitions = int(sys.argv[2]) if sys.argv[2:] else 3
+    size = sum(len(article.encode('utf-8')) for article in articles)
+    print("%i articles, %.2f MB." % (len(articles), size / 1e6))
+    results = []
+    for refactor in [old_refactor_crawler, refactor_crawler]:
+        list(refactor("Warm Up."))
+        seconds, sentences = run(refactor, articles, repetitions)
+        print("%s : %.3f s (%.2f MB/s)." % (refactor.__name__, seconds,
+                                             size * repetitions / 1e6 / max(seconds, 1e-9)))
+        results.append(sentences)
+    different = [i for i in range(len(articles)) if results[0][i] != results[1][i]]
+    print("Same sentences : " + (not different).__str__())
+    for i in different[:5]:
+        print("Article %i : %r" % (i, articles[i][:200]))
+    if different:
+        sys.exit(1)
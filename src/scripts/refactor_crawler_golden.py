@@ -0,0 +1,72 @@
+"""
+@file refactor_crawler_golden.py
+@author PSC INF02
+
+@brief Golden output of parsers.tokenizer.refactor_crawler.
+
+Refactors the sample articles of golden/refactor_crawler_articles.jsons
+(one article per line), and compares their sentences with the expected
+ones, golden/refactor_crawler_sentences.jsons (one list of sentences
+per line). The articles show the cases refactor_crawler deals with
+(glued titles, names like McDonald, several spaces, punctuation...).
+
+Exits with status 1 if the sentences of an article differ.
+
+> python3 refactor_crawler_golden.py
+
+After a wanted change of refactor_crawler, the expected sentences
+are written again with :
+
+> python3 refactor_crawler_golden.py --update
+"""
+
+from abstracter.parsers.tokenizer import refactor_crawler
+from abstracter.util.json_stream import JSONStreamWriter, read_json_stream
+import os
+import sys
+
+GOLDEN_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden")
+
+ARTICLES_FILE = os.path.join(GOLDEN_DIRECTORY, "refactor_crawler_articles.jsons")
+
+SENTENCES_FILE = os.path.join(GOLDEN_DIRECTORY, "refactor_crawler_sentences.jsons")
+
+
+def read_articles():
+    # JSONStreamWriter writes a str as [str]
+    return [article[0] for article in read_json_stream(ARTICLES_FILE)]
+
+
+def update():
+    writer = JSONStreamWriter(SENTENCES_FILE)
+    for article in read_articles():
+        writer.write(list(refactor_crawler(article)))
+    writer.close()
+
+
+def check():
+    """
+    @return The number of articles whose sentences differ from the expected ones.
+    """
+    articles = read_articles()
+    expected = list(read_json_stream(SENTENCES_FILE))
+    if len(expected) != len(articles):
+        print("%i articles, but %i lists of sentences." % (len(articles), len(expected)))
+        return max(len(articles), len(expected))
+    different = 0
+    for i, article in enumerate(articles):
+        sentences = list(refactor_crawler(article))
+        if sentences != expected[i]:
+            different += 1
+            print("Article %i : %r" % (i, article[:200]))
+            print("  expected : %r" % expected[i])
+            print("  found    : %r" % sentences)
+    print("%i articles, %i different." % (len(articles), different))
+    return different
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["--update"]:
+        update()
+    elif check():
+        sys.exit(1)